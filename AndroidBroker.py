@@ -1,11 +1,28 @@
-import bluetooth
 import os
-import json
 import time
 import subprocess
 from typing import Callable
 from Broker import Broker
+from Codec import codec
 from GlobalVariableManager import GVL
+from Messages import Message, AlgoData, AndroidCommand
+from StatusEncoder import StatusEncoder
+from BluetoothWriter import BluetoothWriter
+from StreamFramer import JSONStreamFramer
+from LazyImport import lazy_import
+from collections import deque
+from config import ANDROID_WRITE_QUEUE_SIZE, ANDROID_WRITE_BATCH_BYTES, ANDROID_PUT_TIMEOUT, ANDROID_FLUSH_TIMEOUT
+from config import ANDROID_FRAMING, ANDROID_RECV_SIZE, ENABLE_BLUETOOTH
+
+bluetooth = None  # PyBluez, imported by load_bluetooth() when the first connection is set up
+
+
+def load_bluetooth():
+    global bluetooth
+    if bluetooth is None:
+        bluetooth = lazy_import("bluetooth")
+    return bluetooth
+
 
 class AndroidBroker(Broker):
     def __init__(self):
@@ -13,6 +30,16 @@ class AndroidBroker(Broker):
         self.client_sock = None
         self.client_info = None
         self.uuid = "00001101-0000-1000-8000-00805F9B34FB"  # Unique service UUID
+        self.status_encoder = StatusEncoder()
+        # every outbound message goes through one writer thread, so a Bluetooth stall never blocks the caller
+        self.writer = BluetoothWriter(
+            ANDROID_WRITE_QUEUE_SIZE, ANDROID_WRITE_BATCH_BYTES, ANDROID_PUT_TIMEOUT, ANDROID_FLUSH_TIMEOUT
+        )
+        # incoming bytes are split into complete messages, a read may hold several or part of one
+        self.framer = JSONStreamFramer(mode=ANDROID_FRAMING)
+        self.inbox: deque[str] = deque()
+        # consume() dispatches on the message class
+        self.handlers = {AlgoData: self.on_algo_data, AndroidCommand: self.on_command}
 
     def setup_server(self):
         """Sets up the Bluetooth server socket and makes it discoverable."""
@@ -37,6 +64,7 @@ class AndroidBroker(Broker):
         if self.client_sock:  # Prevent multiple connections
             GVL().logger.info("Bluetooth already connected. Skipping reconnection.")
             return 1
+        load_bluetooth()
 
         max_retries = 6
         attempt = 0
@@ -51,6 +79,7 @@ class AndroidBroker(Broker):
                     self.setup_server()  # Start the Bluetooth server
 
                 self.client_sock, self.client_info = self.server_sock.accept()
+                self.writer.attach(self.client_sock)
                 GVL().logger.info(f"Accepted connection from {self.client_info}")
                 print(f"Accepted connection from {self.client_info}")
 
@@ -68,31 +97,41 @@ class AndroidBroker(Broker):
 
 
     def send(self, message: str) -> None:
-        """Sends a message to the connected Bluetooth client."""
-        if self.client_sock:
-            try:
-                if isinstance(message, dict):
-                    message = json.dumps(message)
+        """Queues a message for the connected Bluetooth client."""
+        if isinstance(message, dict):
+            message = codec.encode(message)
+        if not ENABLE_BLUETOOTH:
+            return  # no Android link is ever attached, nothing would send it
 
-                self.client_sock.send(message + "\n")
-                GVL().logger.info(f"Sent to Android: {message}")
-            except bluetooth.BluetoothError as e:
-                GVL().logger.error(f"Failed to send message: {e}")
+        self.writer.put((message + "\n").encode())
+        GVL().logger.debug(f"Sent to Android: {message}")
+
+    def flush(self, timeout: float = None) -> bool:
+        """Blocks until every queued message has been written."""
+        return self.writer.flush(timeout)
 
     def receive(self) -> str:
-        """Receives a message from the connected Bluetooth client."""
+        """Receives the next complete message from the connected Bluetooth client."""
+        if not self.inbox:
+            self.inbox.extend(self.receive_batch())
+        return self.inbox.popleft() if self.inbox else ""
+
+    def receive_batch(self) -> list[str]:
+        """Reads once and returns every message that read completed."""
         if self.client_sock:
             try:
-                data = self.client_sock.recv(1024).decode().strip()
+                data = self.client_sock.recv(ANDROID_RECV_SIZE)
                 if len(data) == 0:
                     print("Client disconnected.")
                     GVL().logger.warning("Client disconnected. Waiting for new connection...")
                     self.cleanup()  # Properly close the connection
                     self.connect()  # Reconnect
-                    return ""
+                    return []
 
-                GVL().logger.info(f"Received from Android: {data}")
-                return data
+                messages = self.framer.feed(data)
+                for message in messages:
+                    GVL().logger.info(f"Received from Android: {message}")
+                return messages
             except bluetooth.BluetoothError as e:
                 GVL().logger.error(f"Failed to receive message: {e}")
                 self.cleanup()
@@ -101,60 +140,100 @@ class AndroidBroker(Broker):
                 GVL().logger.error(f"Failed to receive message: {e}")
                 self.cleanup()
                 self.connect()  # Attempt to reconnect
-        return ""
+        return []
 
     def close(self) -> None:
         """Closes the Bluetooth sockets properly."""
         if self.client_sock:
+            self.writer.detach(ANDROID_FLUSH_TIMEOUT)
             self.client_sock.close()
             self.client_sock = None
             GVL().logger.info("Closed client socket")
 
-    def run_until_death(self, callback: Callable[[str], None] = None):
-        """Continuously polls for new data and calls the callback function."""
+    def run_until_death(self, callback: Callable[[str], None] = None, batch_callback: Callable[[list[str]], None] = None):
+        """Continuously polls for new data and passes each read's messages to batch_callback, or one by one to callback."""
         while True:
             if not self.client_sock:  # Ensure a valid connection
                 GVL().logger.warning("No active Bluetooth connection. Attempting to reconnect...")
                 self.connect()
 
-            message = self.receive()
-            if message:
-                if message == '''{"from":"android","msg":{"type":"heartbeat"}}''':
-                    pass
-                elif callback:
+            # heartbeats are dropped by the dispatcher's header check
+            messages = self.receive_batch()
+            if not messages:
+                continue
+            if batch_callback:
+                batch_callback(messages)
+            elif callback:
+                for message in messages:
                     callback(message)
 
-    def consume(self, message: dict):
+    def consume(self, message: Message):
         """Processes incoming messages and updates GVL state accordingly."""
         GVL().logger.debug(f"Android Broker received: {message}")
-        if message.get("type") == "algo-data":
-            # straight away give the data to the algo broker, dun wait
-            GVL().android_has_sent_map = True
-            GVL().android_map = message["data"]
-            GVL().android_map_data = message["data"]
-            # invoke the sending of map data to algo broker
-            # make sure to reset the stm instruciton list to None
-            GVL().stm_instruction_list = None
-            print(message["data"])
-            print("sending to algo broker")
-            GVL().algo_broker.send(json.dumps(message))
-            print("sent to algo broker")
-            GVL().logger.info(f"Sent map data to broker {json.dumps(message)}")
-            GVL().android_has_sent_map = True
-            
-        elif message.get("type") == "command":
-            GVL().taskId = int(message["data"]["taskId"])
-            GVL().start = message["data"]["instruction"] == "start"
+        handler = self.handlers.get(type(message))
+        if handler:
+            handler(message)
+
+    def on_algo_data(self, message: AlgoData):
+        cache = getattr(GVL(), "path_cache", None)
+        key = cache.key(message.data) if cache is not None else None
+        path = cache.lookup(key) if cache is not None else None
+        # the map and its path (or the cleared one) land together, task1 never sees a stale path for a new map
+        with GVL.transaction() as tx:
+            tx.android_has_sent_map = True
+            tx.android_map = message.data
+            tx.android_map_data = message.data
+            if path is not None:
+                # same map as an earlier run, its path is already known
+                tx.stm_instruction_list = path["data"]
+                tx.obstacleIdSequence = path["sequence"]
+                tx.coordinates = path["coordinates"]
+            else:
+                # make sure to reset the stm instruciton list to None
+                tx.stm_instruction_list = None
+        if path is not None:
+            GVL().logger.info(f"Path cache hit for map {key[:12]}")
+            return
+        request = message.to_dict()
+        if cache is not None:
+            request_id = cache.begin(key)
+            if request_id is None:
+                # the algo server is already planning this map, its path response fills GVL
+                GVL().logger.info(f"Map {key[:12]} is already being planned, not sending it again")
+                return
+            # echoed back in the path response, so the path is cached under this map
+            request = {**request, "requestId": request_id}
+        # straight away give the data to the algo broker, dun wait
+        GVL().logger.debug(f"Sending map data to algo broker: {message.data}")
+        try:
+            GVL().algo_broker.send(codec.encode(request))
+        except (AssertionError, OSError):
+            # not sent, so nothing will answer it, the next copy of this map must be sent again
+            if cache is not None:
+                cache.abandon(request_id)
+            raise
+        GVL().logger.info(f"Sent map data to broker {message}")
+
+    def on_command(self, message: AndroidCommand):
+        with GVL.transaction() as tx:
+            tx.taskId = message.task_id
+            tx.start = message.start
 
     def cleanup(self):
         """Cleans up Bluetooth sockets before retrying."""
         if self.client_sock:
+            # a write stuck on the dead link is failed, unsent messages wait for the next connection
+            left = self.writer.detach()
+            if left:
+                GVL().logger.warning(f"{left} messages queued for Android until it reconnects")
             try:
                 self.client_sock.close()
                 GVL().logger.info("Client socket closed for cleanup")
             except bluetooth.BluetoothError:
                 pass
             self.client_sock = None
+            # a half-received message from the old connection can never complete
+            self.framer = JSONStreamFramer(mode=ANDROID_FRAMING)
 
     def stop_discovery(self):
         os.system('echo -e "power on\ndiscoverable off\npairable off\nexit" | sudo bluetoothctl')
@@ -183,111 +262,29 @@ class AndroidBroker(Broker):
 
 
 
+    def send_status(self, payload: bytes, coalesce: bool = False):
+        """Queues an encoded status for the writer thread."""
+        if ENABLE_BLUETOOTH:
+            self.writer.put(payload, coalesce)
+
     def send_scanning(self, position_x: int, position_y: int, orientation: str):
-        data = {
-                "from": "rpi",
-                "msg": {
-                "type": "status",
-                "data": {
-                        "nextAction": "scanning",
-                        "currentPosition": {
-                        "orientation": orientation,
-                        "x": position_x,
-                        "y": position_y
-                        }
-                    }
-                }
-            }
-        self.send(data)
+        self.send_status(self.status_encoder.encode("scanning", position_x, position_y, orientation))
 
     def send_obstacle_image_found(self, position_x: int, position_y: int, orientation: str, obstacle_id: int, image_id: int):
-        data = {
-                "from": "rpi",
-                "msg": {
-                        "type": "status",
-                        "data": {
-                        "nextAction": "idle",
-                        "currentPosition": {
-                            "orientation": orientation,
-                            "x": position_x,
-                            "y": position_y
-                        },
-                        "target": {
-                            "obstacleId": obstacle_id,
-                            "imageId": image_id
-                        }
-                    }
-                }
-            }
-        self.send(data)
+        self.send_status(self.status_encoder.encode("idle", position_x, position_y, orientation, obstacle_id, image_id))
 
     def send_idling(self, position_x: int, position_y: int, orientation: str):
-        data = {
-                "from": "rpi",
-                "msg": {
-                    "type": "status",
-                    "data": {
-                        "nextAction": "idle",
-                        "currentPosition": {
-                            "orientation": orientation,
-                            "x": position_x,
-                            "y": position_y
-                        }
-                    }
-                }
-            }
-        self.send(data)
+        self.send_status(self.status_encoder.encode("idle", position_x, position_y, orientation))
 
     def send_moving(self, position_x: int, position_y: int, orientation: str):
-        data = {
-                "from": "rpi",
-                "msg": {
-                    "type": "status",
-                    "data": {
-                        "nextAction": "moving",
-                        "currentPosition": {
-                            "orientation": orientation,
-                            "x": position_x,
-                            "y": position_y
-                        }
-                    }
-                }
-            }
-        self.send(data)
+        # only the latest position matters if the link falls behind
+        self.send_status(self.status_encoder.encode("moving", position_x, position_y, orientation), coalesce=True)
 
     def send_finished(self, position_x: int, position_y: int, orientation: str):
-        data = {
-                "from": "rpi",
-                "msg": {
-                    "type": "status",
-                    "data": {
-                        "nextAction": "finished",
-                        "currentPosition": {
-                            "orientation": orientation,
-                            "x": position_x,
-                            "y": position_y
-                        }
-                    }
-                }
-            }
-        self.send(data)
+        self.send_status(self.status_encoder.encode("finished", position_x, position_y, orientation))
 
     def send_error(self, position_x: int, position_y: int, orientation: str):
-        data = {
-                "from": "rpi",
-                "msg": {
-                    "type": "status",
-                    "data": {
-                        "nextAction": "error",
-                        "currentPosition": {
-                            "orientation": orientation,
-                            "x": position_x,
-                            "y": position_y
-                        }
-                    }
-                }
-            }
-        self.send(data)
+        self.send_status(self.status_encoder.encode("error", position_x, position_y, orientation))
 
 
 if __name__ == "__main__":
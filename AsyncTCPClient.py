@@ -0,0 +1,164 @@
+import asyncio
+import itertools
+from collections import deque
+from concurrent.futures import Future
+from threading import Thread
+from typing import Callable
+
+from Codec import codec
+from Messages import Message, PredictionResult
+from GlobalVariableManager import GVL
+from TCPClient import TCPClient
+from config import TCP_RECV_SIZE, TCP_CONNECT_TIMEOUT
+
+
+class AsyncTCPClient(TCPClient):
+    """
+    TCPClient whose link runs on its own asyncio loop.
+    request() tags outgoing dict messages with a requestId and returns a future that resolves with the
+    matching typed response msg, so several requests can be in flight without polling GVL. Responses without
+    a requestId (servers that do not echo it, or untagged string requests) are matched first-in first-out
+    per expected type, which is exact on a single ordered connection.
+    Every incoming message is still handed to the run_until_death callback, so consume() keeps GVL in sync.
+    """
+
+    def __init__(self, server_host='127.0.0.1', server_port=12345):
+        super().__init__(server_host, server_port)
+        self.loop = asyncio.new_event_loop()
+        self.loop_thread: Thread = None
+        self.reader: asyncio.StreamReader = None
+        self.writer: asyncio.StreamWriter = None
+        self.request_ids = itertools.count(1)
+        self.requests: dict[int, asyncio.Future] = {}
+        self.requests_by_type: dict[str, deque[asyncio.Future]] = {}
+
+    def _submit(self, coro) -> Future:
+        if self.loop_thread is None:
+            self.loop_thread = Thread(target=self.loop.run_forever, name=f"tcp-{self.server_port}", daemon=True)
+            self.loop_thread.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def connect(self, timeout: float = TCP_CONNECT_TIMEOUT):
+        return self._submit(self._connect(timeout)).result()
+
+    async def _connect(self, timeout: float) -> bool:
+        try:
+            self.reader, self.writer = await asyncio.wait_for(
+                asyncio.open_connection(self.server_host, self.server_port), timeout
+            )
+            return True
+        except (OSError, asyncio.TimeoutError):
+            return False
+
+    def send(self, message):
+        assert self.writer is not None, "client not connected"
+        self._submit(self._write(message)).result()
+
+    async def _write(self, message: str):
+        self.writer.write(message.encode('utf-8'))
+        await self.writer.drain()
+
+    def receive(self):
+        """Returns the next complete message, None once the server closed. Not for use next to run_until_death."""
+        if not self.pending:
+            self.pending.extend(self._submit(self._receive_all()).result())
+        return self.pending.popleft() if self.pending else None
+
+    async def _receive_all(self) -> list[str]:
+        """Reads until at least one message is complete and returns all of them, [] once the server closed."""
+        assert self.reader is not None, "Client not connected, cannot receive"
+        while True:
+            chunk = await self.reader.read(TCP_RECV_SIZE)
+            if not chunk:
+                return []
+            messages = self.framer.feed(chunk)
+            if messages:
+                return messages
+
+    def run_until_death(self, callback: Callable[[str], None]):
+        """Runs the read loop on the client's event loop and blocks the calling thread until the link closes."""
+        assert self.reader is not None, "Client not connected, cannot receive"
+        self._submit(self._read_loop(callback)).result()
+
+    async def _read_loop(self, callback: Callable[[str], None]):
+        try:
+            # messages buffered by an earlier receive() come first
+            messages = list(self.pending)
+            self.pending.clear()
+            while True:
+                for message in messages:
+                    if self.requests:
+                        self._resolve(message)
+                    if callback:
+                        callback(message)
+                messages = await self._receive_all()
+                if not messages:
+                    break
+        finally:
+            GVL().logger.warning(f"Link to {self.server_host}:{self.server_port} closed")
+            self._fail_all(ConnectionError(f"{self.server_host}:{self.server_port} closed the connection"))
+
+    def _resolve(self, message: str):
+        try:
+            _, content = codec.decode_message(message)
+        except (KeyError, TypeError, ValueError):
+            return
+        request_id = getattr(content, "request_id", None)
+        if request_id is not None:
+            # a tagged response only ever answers its own request, a late one must not take another's place
+            future = self.requests.get(request_id)
+            if future is None:
+                GVL().logger.warning(f"Response to request {request_id} is no longer awaited, not matched")
+                return
+        else:
+            future = None
+            waiting = self.requests_by_type.get(content.type)
+            while waiting and future is None:
+                candidate = waiting.popleft()
+                if not candidate.done():
+                    future = candidate
+        if future is not None and not future.done():
+            future.set_result(content)
+
+    def _fail_all(self, error: Exception):
+        for future in self.requests.values():
+            if not future.done():
+                future.set_exception(error)
+        self.requests.clear()
+        self.requests_by_type.clear()
+
+    async def request_async(self, message, expect: str, timeout: float = None) -> Message:
+        """Sends a request and waits for the response msg of type expect."""
+        future = self.loop.create_future()
+        request_id = next(self.request_ids)
+        if isinstance(message, dict):
+            message = {**message, "msg": {**message["msg"], "requestId": request_id}}
+            message = codec.encode(message)
+        self.requests[request_id] = future
+        self.requests_by_type.setdefault(expect, deque()).append(future)
+        try:
+            await self._write(message)
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self.requests.pop(request_id, None)
+            waiting = self.requests_by_type.get(expect)
+            if waiting and future in waiting:
+                waiting.remove(future)
+
+    def request(self, message, expect: str, timeout: float = None) -> Future:
+        """Thread-safe request(), the returned future resolves with the matching response msg."""
+        return self._submit(self.request_async(message, expect, timeout))
+
+    def request_prediction(self, timeout: float = None) -> Future:
+        """Asks the image server for a prediction, resolves with its prediction-result msg."""
+        return self.request("predict", "prediction-result", timeout)
+
+    def predict(self, timeout: float = None) -> PredictionResult:
+        """
+        Same call as TCPClient.predict, answered on the main link. consume() stores the result in GVL when
+        the read loop hands it to the dispatcher. Raises TimeoutError/ConnectionError like the pooled version.
+        """
+        try:
+            return self.request_prediction(timeout).result()
+        except asyncio.TimeoutError as e:
+            raise TimeoutError(f"No prediction from {self.server_host}:{self.server_port} within {timeout}s") from e
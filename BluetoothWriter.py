@@ -0,0 +1,188 @@
+import socket
+import time
+from collections import deque
+from threading import Thread, Condition
+
+from GlobalVariableManager import GVL
+
+
+class BluetoothWriter:
+    """
+    Single writer thread for a Bluetooth socket. Queued newline-delimited messages are batched into one
+    socket write. The queue is bounded: put() waits up to put_timeout for room and then drops the message.
+    A coalescable message (a position update) replaces a coalescable message still waiting at the tail.
+    Messages queued while no socket is attached are sent once attach() is called with the new socket; as
+    nothing drains the queue meanwhile, a full queue drops its oldest message instead of making put() wait.
+    A failed write (an error, or send() returning 0) stops using the socket, and the messages it had not
+    started on are queued again, ahead of the rest.
+    """
+
+    def __init__(self, max_pending: int = 64, max_batch_bytes: int = 4096, put_timeout: float = 1.0,
+                 detach_timeout: float = 2.0):
+        self.max_pending = max_pending
+        self.max_batch_bytes = max_batch_bytes
+        self.put_timeout = put_timeout
+        self.detach_timeout = detach_timeout
+        self.condition = Condition()
+        self.pending: deque[tuple[bytes, bool]] = deque()
+        self.sock = None
+        self.writing = False
+        self.thread: Thread = None
+        # metrics
+        self.batches = 0
+        self.messages = 0
+        self.bytes = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_write_latency = 0.0
+        self.total_write_latency = 0.0
+        self.max_write_latency = 0.0
+
+    def attach(self, sock):
+        """Starts (or resumes) writing queued messages to sock."""
+        with self.condition:
+            if self.thread is None:
+                self.thread = Thread(target=self._run, name="android-writer", daemon=True)
+                self.thread.start()
+            self.sock = sock
+            self.condition.notify_all()
+
+    @property
+    def attached(self) -> bool:
+        return self.sock is not None
+
+    def detach(self, flush_timeout: float = 0) -> int:
+        """
+        Gives the writer up to flush_timeout to drain, then stops using the socket and shuts it down, so a
+        write blocked on a dead link fails instead of hanging. Waits at most detach_timeout for that write.
+        Returns messages left queued. The caller still closes the socket.
+        """
+        if flush_timeout:
+            self.flush(flush_timeout)
+        with self.condition:
+            sock, self.sock = self.sock, None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except (IOError, OSError):
+                pass  # already closed or never connected
+        with self.condition:
+            if not self.condition.wait_for(lambda: not self.writing, self.detach_timeout):
+                GVL().logger.warning(f"Android write still in flight after {self.detach_timeout}s, detaching anyway")
+            return len(self.pending)
+
+    def put(self, payload: bytes, coalesce: bool = False) -> bool:
+        """Queues a message, returns False if it had to be dropped because the queue stayed full."""
+        with self.condition:
+            if coalesce and self.pending and self.pending[-1][1]:
+                self.pending[-1] = (payload, True)
+                self.coalesced += 1
+                return True
+            if self.sock is None and len(self.pending) >= self.max_pending:
+                self.pending.popleft()
+                self.dropped += 1
+            elif not self.condition.wait_for(lambda: len(self.pending) < self.max_pending, self.put_timeout):
+                self.dropped += 1
+                GVL().logger.warning(f"Android write queue full, dropping {payload[:60]}")
+                return False
+            self.pending.append((payload, coalesce))
+            self.condition.notify_all()
+            return True
+
+    def flush(self, timeout: float = None) -> bool:
+        """Blocks until everything queued has been written. Returns False on timeout, or at once without a socket."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.sock is None or (not self.pending and not self.writing), timeout)
+            return not self.pending and not self.writing
+
+    def _take_batch(self) -> list[tuple[bytes, bool]]:
+        batch = []
+        size = 0
+        while self.pending and (not batch or size + len(self.pending[0][0]) <= self.max_batch_bytes):
+            batch.append(self.pending.popleft())
+            size += len(batch[-1][0])
+        return batch
+
+    @staticmethod
+    def _split(items: list[tuple[bytes, bool]], written: int) -> tuple[int, list[tuple[bytes, bool]]]:
+        """Messages of a batch fully written by a failed write, and the ones it did not start on."""
+        complete = 0
+        unsent = []
+        start = 0
+        for item in items:
+            end = start + len(item[0])
+            if end <= written:
+                complete += 1
+            elif start >= written:
+                unsent.append(item)
+            start = end
+        return complete, unsent
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending and self.sock is not None)
+                sock = self.sock
+                items = self._take_batch()
+                self.writing = True
+                self.condition.notify_all()  # room for blocked put() calls
+            batch = b"".join(payload for payload, _ in items)
+            failed = False
+            complete, unsent = len(items), []
+            written = 0
+            started = time.perf_counter()
+            try:
+                view = memoryview(batch)
+                while written < len(batch):
+                    sent = sock.send(view[written:])
+                    if not sent:
+                        raise OSError("connection closed while sending")
+                    written += sent
+            except (IOError, OSError) as e:
+                failed = True
+                self.errors += 1
+                GVL().logger.error(f"Failed to send message: {e}")
+                # the rest goes out on the next attached socket, ahead of anything queued since,
+                # a message cut off halfway is dropped
+                complete, unsent = self._split(items, written)
+            finally:
+                elapsed = time.perf_counter() - started
+                with self.condition:
+                    self.pending.extendleft(reversed(unsent))
+                    if failed and self.sock is sock:
+                        self.sock = None  # broken link, wait for the next attach()
+                    self.writing = False
+                    self.batches += 1
+                    self.messages += complete
+                    self.dropped += len(items) - complete - len(unsent)
+                    self.bytes += written
+                    self.last_write_latency = elapsed
+                    self.total_write_latency += elapsed
+                    self.max_write_latency = max(self.max_write_latency, elapsed)
+                    self.condition.notify_all()
+
+    def stats(self) -> dict:
+        """Queue depth and write latency (in ms) of the writer."""
+        with self.condition:
+            return {
+                "depth": len(self.pending),
+                "batches": self.batches,
+                "messages": self.messages,
+                "bytes": self.bytes,
+                "coalesced": self.coalesced,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "last_write_ms": self.last_write_latency * 1000,
+                "avg_write_ms": self.total_write_latency / self.batches * 1000 if self.batches else 0.0,
+                "max_write_ms": self.max_write_latency * 1000,
+            }
+
+    def report(self):
+        """Logs the current queue and write statistics."""
+        stats = self.stats()
+        GVL().logger.info(
+            f"Android writer: depth={stats['depth']} messages={stats['messages']} batches={stats['batches']} "
+            f"coalesced={stats['coalesced']} dropped={stats['dropped']} errors={stats['errors']} "
+            f"avg={stats['avg_write_ms']:.2f}ms max={stats['max_write_ms']:.2f}ms"
+        )
@@ -1,6 +1,8 @@
 from abc import ABC, abstractmethod
 from typing import Callable
 
+from Messages import Message
+
 class Broker(ABC):
     @abstractmethod
     def connect(self):
@@ -19,7 +21,7 @@ class Broker(ABC):
         pass
 
     @abstractmethod
-    def consume(self, message: str):
+    def consume(self, message: Message):
         pass
 
     
\ No newline at end of file
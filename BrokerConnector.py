@@ -0,0 +1,94 @@
+import time
+from threading import Thread, Condition
+from typing import Callable
+
+from Broker import Broker
+from GlobalVariableManager import GVL
+
+
+class LinkStatus:
+    """Readiness of one broker's link."""
+    __slots__ = ("name", "timeout", "started", "ready", "connected_at", "attempts", "last_error")
+
+    def __init__(self, name: str, timeout: float):
+        self.name = name
+        self.timeout = timeout
+        self.started = time.monotonic()
+        self.ready = False
+        self.connected_at: float = None  # seconds after started
+        self.attempts = 0
+        self.last_error: str = None
+
+    @property
+    def deadline(self) -> float:
+        return self.started + self.timeout
+
+    def __repr__(self):
+        if self.ready:
+            return f"{self.name} ready in {self.connected_at:.2f} s (attempts: {self.attempts})"
+        error = f", last error: {self.last_error}" if self.last_error else ""
+        return f"{self.name} NOT READY after {self.timeout:.1f} s (attempts: {self.attempts}{error}), still trying"
+
+
+class BrokerConnector:
+    """
+    Connects every broker on its own thread, all at once. A broker starts receiving on that thread as
+    soon as its own link is up, so startup takes as long as the slowest link, not the sum of all of them.
+    connect() is retried until it succeeds; a link that misses its timeout is reported as not ready and
+    keeps trying in the background.
+    """
+
+    def __init__(self, retry_interval: float = 1.0):
+        self.retry_interval = retry_interval
+        self.links: dict[str, LinkStatus] = {}
+        self.condition = Condition()
+
+    @staticmethod
+    def _connected(result) -> bool:
+        # brokers report success as 1 or True, failure as -1, 0, False or None
+        return result is not None and result is not False and result != -1 and result != 0
+
+    def start(self, name: str, broker: Broker, timeout: float, receive: Callable[[], None]) -> Thread:
+        """Connects broker on a new thread and then runs receive() on it."""
+        status = LinkStatus(name, timeout)
+        with self.condition:
+            self.links[name] = status
+        thread = Thread(target=self._run, args=(status, broker, receive), name=f"connect-{name}")
+        thread.start()
+        return thread
+
+    def _run(self, status: LinkStatus, broker: Broker, receive: Callable[[], None]):
+        while True:
+            status.attempts += 1
+            try:
+                if self._connected(broker.connect()):
+                    break
+                status.last_error = None
+            except Exception as e:
+                status.last_error = repr(e)
+            time.sleep(self.retry_interval)
+
+        with self.condition:
+            status.connected_at = time.monotonic() - status.started
+            status.ready = True
+            self.condition.notify_all()
+        if status.connected_at > status.timeout:
+            GVL().logger.warning(f"{status.name} connected late, after {status.connected_at:.2f} s")
+        else:
+            GVL().logger.info(f"{status.name} connected in {status.connected_at:.2f} s")
+        receive()
+
+    def wait(self) -> bool:
+        """Blocks until every link is ready or past its timeout. Returns True if all of them are ready."""
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                remaining = [s.deadline - now for s in self.links.values() if not s.ready and s.deadline > now]
+                if not remaining:
+                    return all(s.ready for s in self.links.values())
+                self.condition.wait(min(remaining))
+
+    def report(self) -> str:
+        """One line per link, e.g. for the startup log."""
+        with self.condition:
+            return "\n".join(repr(status) for status in self.links.values())
@@ -0,0 +1,152 @@
+import json
+from typing import Optional, Union
+
+from Messages import Message, StmAck, AlgoData, AndroidCommand, AlgoPath, PredictionResult, message_from_dict
+from config import JSON_CODEC
+
+# optional faster backends, the stdlib backend is always available
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+class JSONCodec:
+    """Stdlib json backend. Every backend raises a ValueError subclass on malformed input."""
+    name = "json"
+
+    def decode(self, data):
+        """str or bytes -> plain Python objects."""
+        return json.loads(data)
+
+    def encode(self, obj) -> str:
+        return json.dumps(obj)
+
+    def encode_bytes(self, obj) -> bytes:
+        return json.dumps(obj).encode()
+
+    def decode_message(self, data) -> tuple[str, Message]:
+        """Decodes a {"from": ..., "msg": {...}} message, returns (sender, typed msg)."""
+        res = self.decode(data)
+        return res["from"], message_from_dict(res["msg"])
+
+
+class OrjsonCodec(JSONCodec):
+    """orjson backend, same plain objects as the stdlib backend."""
+    name = "orjson"
+
+    def __init__(self):
+        # json.dumps stringifies int keys, orjson needs to be told to
+        self.options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def decode(self, data):
+        return orjson.loads(data)
+
+    def encode(self, obj) -> str:
+        return orjson.dumps(obj, option=self.options).decode()
+
+    def encode_bytes(self, obj) -> bytes:
+        return orjson.dumps(obj, option=self.options)
+
+
+if msgspec is not None:
+    # wire schemas of the message kinds the brokers consume, selected by msg["type"]
+    # any other field fails validation and takes the generic path, so it is still forwarded to the algo server
+    class AlgoDataStruct(msgspec.Struct, tag="algo-data", tag_field="type", forbid_unknown_fields=True):
+        data: dict
+
+        def to_message(self):
+            return AlgoData(self.data)
+
+    class CommandStruct(msgspec.Struct, tag="command", tag_field="type"):
+        data: dict
+
+        def to_message(self):
+            return AndroidCommand.from_data(self.data)
+
+    class PathStruct(msgspec.Struct, tag="path", tag_field="type"):
+        data: list
+        sequence: Optional[list] = None
+        coordinates: Optional[list] = None
+        requestId: Optional[int] = None
+
+        def to_message(self):
+            return AlgoPath(self.data, self.sequence, self.coordinates, self.requestId)
+
+    class PredictionResultStruct(msgspec.Struct, tag="prediction-result", tag_field="type"):
+        data: object = None
+        requestId: Optional[int] = None
+
+        def to_message(self):
+            return PredictionResult(self.data, self.requestId)
+
+    class AckStruct(msgspec.Struct, tag="ack", tag_field="type"):
+        seq: Optional[int] = None
+
+        def to_message(self):
+            return StmAck(self.seq)
+
+    class MessageStruct(msgspec.Struct):
+        sender: str = msgspec.field(name="from")
+        msg: Union[AlgoDataStruct, CommandStruct, PathStruct, PredictionResultStruct, AckStruct]
+
+
+class MsgspecCodec(JSONCodec):
+    """
+    msgspec backend. decode_message() validates the known message kinds (algo-data, command, path,
+    prediction-result, ack) against their schema while parsing, without building intermediate dicts.
+    """
+    name = "msgspec"
+
+    def __init__(self):
+        self.decoder = msgspec.json.Decoder()
+        self.message_decoder = msgspec.json.Decoder(MessageStruct)
+        self.encoder = msgspec.json.Encoder()
+
+    def decode(self, data):
+        return self.decoder.decode(data)
+
+    def encode(self, obj) -> str:
+        return self.encoder.encode(obj).decode()
+
+    def encode_bytes(self, obj) -> bytes:
+        return self.encoder.encode(obj)
+
+    def decode_message(self, data):
+        try:
+            message = self.message_decoder.decode(data)
+        except msgspec.ValidationError:
+            # valid JSON of a kind without a schema, or a loosely typed field such as a string seq
+            return super().decode_message(data)
+        return message.sender, message.msg.to_message()
+
+
+_BACKENDS = {
+    "json": (JSONCodec, True),
+    "orjson": (OrjsonCodec, orjson is not None),
+    "msgspec": (MsgspecCodec, msgspec is not None),
+}
+
+
+def available_codecs() -> list[str]:
+    """Names of the backends that can be used in this environment."""
+    return [name for name, (_, available) in _BACKENDS.items() if available]
+
+
+def get_codec(name: str = "auto") -> JSONCodec:
+    """
+    Backend by name. "auto" picks msgspec, then orjson, then the stdlib. Asking for a backend that is
+    not installed falls back to the stdlib.
+    """
+    if name == "auto":
+        name = next((n for n in ("msgspec", "orjson") if _BACKENDS[n][1]), "json")
+    backend, available = _BACKENDS.get(name, (JSONCodec, False))
+    return backend() if available else JSONCodec()
+
+
+codec = get_codec(JSON_CODEC)
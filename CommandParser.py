@@ -1,7 +1,29 @@
-import json
 import math
 
+from Codec import codec
 from GlobalVariableManager import GVL
+from LazyImport import lazy_import
+
+np = None  # NumPy, imported by load_numpy() when a path first has enough new turns to vectorize, False if missing
+
+
+def load_numpy():
+    global np
+    if np is None:
+        try:
+            np = lazy_import("numpy")
+        except ImportError:
+            np = False
+    return np
+
+# turning radius of the robot for each direction, converts an arc length into degrees
+LEFT_RADIUS = 26
+RIGHT_RADIUS = 25
+_STRAIGHTS = {"s": "FW", "b": "BW"}
+_TURNS = {"l": ("AF", LEFT_RADIUS), "r": ("CF", RIGHT_RADIUS)}
+_VECTORIZE_MIN = 32  # below this many new turn values plain math is faster than building arrays
+_COMMAND_CACHE_SIZE = 4096
+
 
 class CommandParser:
     def __init__(self):
@@ -12,9 +34,9 @@ class CommandParser:
     @staticmethod
     def json_decode(msg: str) -> dict:
         try:
-            res = json.loads(msg)
+            res = codec.decode(msg)
             return res
-        except json.decoder.JSONDecodeError:
+        except ValueError:
             # print("Error with decoding, please format data properly")
             return {"error": True}
 
@@ -34,8 +56,8 @@ class CommandParser:
         length = 5  # Ensure total length is 5 characters
         movement = ""
         key = list(algo_command.keys())[0]
-        leftR = 26
-        rightR = 25
+        leftR = LEFT_RADIUS
+        rightR = RIGHT_RADIUS
         val = algo_command[key]
         if key == "b":
             movement = "BW"
@@ -60,10 +82,103 @@ class CommandParser:
 
 
 
+    @staticmethod
+    def optimize_algo_path(path_list, coordinates):
+        """
+        Merges consecutive straight segments in the same direction and cancels straight pairs that
+        add up to zero, so the STM sees fewer commands. Turns, scan points and anything unknown are
+        kept as they are and are never merged across.
+        coordinates[k] is the position reported before the k-th motion segment, so a merged segment
+        keeps the coordinate of its first part and a cancelled pair drops both. Entries past the last
+        motion, and the final position, are kept.
+        Returns (path, coordinates, removed round trips).
+        """
+        straight = {"s": 1, "b": -1}
+        merged = []  # [key, distance, coordinate index or None]
+        motion_idx = 0
+        for path in path_list:
+            key = list(path.keys())[0]
+            coordinate_idx = None
+            if key != "p":
+                coordinate_idx = motion_idx
+                motion_idx += 1
+            if key not in straight:
+                merged.append([key, path[key], coordinate_idx])
+                continue
+            # what the STM would have been sent for this segment on its own
+            distance = abs(int(float(path[key])))
+            top = merged[-1] if merged else None
+            if top is not None and top[0] in straight and top[0] != key and top[1] == distance:
+                merged.pop()  # forward and back by the same distance
+            elif top is not None and top[0] == key and top[1] + distance <= 999:
+                top[1] += distance
+            else:
+                merged.append([key, distance, coordinate_idx])
+
+        new_path = [{key: value} for key, value, _ in merged]
+        new_coordinates = [coordinates[idx] for _, _, idx in merged if idx is not None and idx < len(coordinates)]
+        new_coordinates.extend(coordinates[motion_idx:])
+        if coordinates and (not new_coordinates or new_coordinates[-1] is not coordinates[-1]):
+            new_coordinates.append(coordinates[-1])
+        return new_path, new_coordinates, len(path_list) - len(new_path)
+
+    # (key, value) -> STM command, magnitudes repeat a lot within and across paths
+    _command_cache: dict = {}
+
+    @staticmethod
+    def _turn_degrees(values: list, radius: int) -> list:
+        # same operations in the same order as map_algo_to_stm_command, so the results are identical
+        if len(values) >= _VECTORIZE_MIN and load_numpy():
+            return np.trunc(np.asarray(values, dtype=np.float64) / radius * 180 / math.pi).astype(np.int64).tolist()
+        return [int(value / radius * 180 / math.pi) for value in values]
+
+    @staticmethod
+    def compile_path(path_list) -> list:
+        """
+        map_algo_to_stm_command for a whole path in one pass. Commands are memoized by segment, and the
+        turns not seen before are converted together, vectorized with NumPy when there are many of them.
+        """
+        cache = CommandParser._command_cache
+        if len(cache) > _COMMAND_CACHE_SIZE:
+            cache.clear()
+        segments = []
+        for path in path_list:
+            for key in path:
+                break
+            segments.append((key, path[key]))
+
+        new_turns = {key: [] for key in _TURNS}
+        for segment in dict.fromkeys(segments):
+            if segment in cache:
+                continue
+            key, value = segment
+            if key in _TURNS:
+                new_turns[key].append(value)
+            elif key in _STRAIGHTS:
+                cache[segment] = _STRAIGHTS[key] + str(abs(int(float(value)))).zfill(3)
+            elif key == "p":
+                cache[segment] = "P0100"
+            # anything else is an unhandled movement type and compiles to None
+
+        for key, values in new_turns.items():
+            if values:
+                movement, radius = _TURNS[key]
+                for value, degree in zip(values, CommandParser._turn_degrees(values, radius)):
+                    cache[(key, value)] = movement + str(abs(degree)).zfill(3)
+        return [cache.get(segment) for segment in segments]
+
+    @staticmethod
+    def compile_paths(path_lists) -> list:
+        """compile_path for several paths at once, e.g. the candidates sent while re-planning."""
+        commands = CommandParser.compile_path([path for path_list in path_lists for path in path_list])
+        compiled = []
+        start = 0
+        for path_list in path_lists:
+            compiled.append(commands[start:start + len(path_list)])
+            start += len(path_list)
+        return compiled
+
     @staticmethod
     def parse_algo_path_to_stm_queue(path_list):
         # parse
-        parsed_commands = []
-        for path in path_list:
-            parsed_commands.append(CommandParser.map_algo_to_stm_command(path))
-        return parsed_commands
+        return CommandParser.compile_path(path_list)
@@ -0,0 +1,135 @@
+import queue
+import time
+from threading import Thread, Lock
+from typing import Callable
+
+from Broker import Broker
+from GlobalVariableManager import GVL
+from IngressClassifier import Envelope, classify
+
+
+class DispatchLane:
+    """Ordered lane with a single worker thread for the messages of one source."""
+
+    def __init__(self, name: str, broker: Broker, after_consume: Callable[[], None] = None, maxsize: int = 100):
+        self.name = name
+        self.broker = broker
+        self.after_consume = after_consume
+        self.queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self.stats_lock = Lock()
+        self.processed = 0
+        self.errors = 0
+        self.last_latency = 0.0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def put(self, envelope: Envelope):
+        """Queue a classified message, blocking only this source's reader when the lane is full."""
+        self.queue.put(envelope)
+
+    def run_until_death(self):
+        """Consume messages in arrival order, one at a time."""
+        while True:
+            envelope = self.queue.get()
+            started = time.perf_counter()
+            failed = False
+            try:
+                # the payload is decoded here, on the lane's own thread
+                self.broker.consume(envelope.msg)
+                if self.after_consume:
+                    self.after_consume()
+            except Exception as e:
+                failed = True
+                GVL().logger.error(f"[{self.name}] failed to consume message: {e}")
+            finally:
+                elapsed = time.perf_counter() - started
+                with self.stats_lock:
+                    self.processed += 1
+                    self.errors += failed
+                    self.last_latency = elapsed
+                    self.total_latency += elapsed
+                    self.max_latency = max(self.max_latency, elapsed)
+                self.queue.task_done()
+
+    def stats(self) -> dict:
+        """Queue depth and consume latency (in ms) of this lane."""
+        with self.stats_lock:
+            return {
+                "depth": self.queue.qsize(),
+                "processed": self.processed,
+                "errors": self.errors,
+                "last_latency_ms": self.last_latency * 1000,
+                "avg_latency_ms": self.total_latency / self.processed * 1000 if self.processed else 0.0,
+                "max_latency_ms": self.max_latency * 1000,
+            }
+
+
+class LaneDispatcher:
+    """Routes incoming messages to one ordered lane per source so a slow broker never stalls the others."""
+
+    def __init__(self, brokers: dict, after_consume: Callable[[], None] = None, maxsize: int = 100,
+                 fast_paths: dict = None, record_file: str = None):
+        self.lanes: dict[str, DispatchLane] = {
+            name: DispatchLane(name, broker, after_consume, maxsize) for name, broker in brokers.items()
+        }
+        # (sender, type) -> handler(envelope), run straight on the reader thread, a ValueError drops the message
+        self.fast_paths: dict[tuple[str, str], Callable[[Envelope], None]] = fast_paths or {}
+        # raw incoming traffic, one message per line, for bench_codec.py
+        self.record = open(record_file, "a", encoding="utf-8") if record_file else None
+        self.record_lock = Lock()
+
+    def start(self) -> list[Thread]:
+        """Starts one worker thread per lane."""
+        threads = []
+        for name, lane in self.lanes.items():
+            thread = Thread(target=lane.run_until_death, name=f"lane-{name}", daemon=True)
+            thread.start()
+            threads.append(thread)
+        return threads
+
+    def dispatch(self, message: str):
+        """Classify a raw message by its header on the caller's thread and queue it on its source's lane."""
+        if self.record:
+            self._record(message)
+        envelope = classify(message)
+        if envelope is None:
+            GVL().logger.warning(f"Invalid message format: {message}")
+            return
+        if envelope.type == "heartbeat":
+            return
+        fast_path = self.fast_paths.get((envelope.sender, envelope.type))
+        if fast_path:
+            try:
+                fast_path(envelope)
+            except ValueError as e:
+                GVL().logger.warning(f"Invalid message format: {e}: {message}")
+            return
+        GVL().logger.info(f"Processing Message: {message}")
+        lane = self.lanes.get(envelope.sender)
+        if lane is None:
+            GVL().logger.warning(f"Invalid message format: unknown sender {envelope.sender}")
+            return
+        lane.put(envelope)
+
+    def _record(self, message: str):
+        # a raw newline can only be whitespace between JSON tokens
+        with self.record_lock:
+            self.record.write(message.replace("\n", " ") + "\n")
+            self.record.flush()
+
+    def dispatch_batch(self, messages: list[str]):
+        """Dispatches every message from one read, keeping their order."""
+        for message in messages:
+            self.dispatch(message)
+
+    def stats(self) -> dict:
+        """Per-lane queue depth and consume latency."""
+        return {name: lane.stats() for name, lane in self.lanes.items()}
+
+    def report(self):
+        """Logs the current per-lane statistics."""
+        for name, stats in self.stats().items():
+            GVL().logger.info(
+                f"Lane {name}: depth={stats['depth']} processed={stats['processed']} errors={stats['errors']} "
+                f"avg={stats['avg_latency_ms']:.2f}ms max={stats['max_latency_ms']:.2f}ms"
+            )
@@ -0,0 +1,123 @@
+import time
+from datetime import datetime
+from threading import Lock, current_thread
+
+SUMMARY_LENGTH = 80
+
+
+_SCALARS = (type(None), bool, int, float)
+
+
+def summarize(value):
+    """Constant-time stand-in for a value: scalars as they are, long strings cut, containers by size."""
+    if type(value) in _SCALARS or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        return value if len(value) <= SUMMARY_LENGTH else value[:SUMMARY_LENGTH] + "..."
+    if isinstance(value, (list, tuple, dict, set, frozenset)):
+        return f"<{type(value).__name__} len={len(value)}>"
+    return f"<{type(value).__name__}>"
+
+
+class GVLJournal:
+    """
+    Fixed-size ring of committed GVL changes: wall time, version, key, old and new value summaries and
+    the writing thread. Every slot is allocated up front and overwritten in place, so recording a change
+    is constant time and memory never grows. Overwritten changes are folded into a base state, which
+    lets state_at() rebuild the state at any version still covered by the ring.
+    """
+
+    def __init__(self, capacity: int = 1024, state: dict = None):
+        self.capacity = capacity
+        self.lock = Lock()
+        self.times = [0.0] * capacity
+        self.versions = [0] * capacity
+        self.keys = [None] * capacity
+        self.old = [None] * capacity
+        self.new = [None] * capacity
+        self.threads = [None] * capacity
+        self.count = 0  # changes recorded so far, the next one goes to count % capacity
+        self.base: dict = {}  # summaries of the state just before the oldest retained change
+        self.base_version = 0
+        self.base_time = 0.0
+        if state is not None:
+            self.reset(state, 0)
+
+    def record(self, version: int, key, old, new):
+        with self.lock:
+            slot = self.count % self.capacity
+            if self.count >= self.capacity:
+                # the change falling out of the ring becomes part of the base state
+                self.base[self.keys[slot]] = self.new[slot]
+                self.base_version = self.versions[slot]
+                self.base_time = self.times[slot]
+            self.times[slot] = time.time()
+            self.versions[slot] = version
+            self.keys[slot] = key
+            self.old[slot] = summarize(old)
+            self.new[slot] = summarize(new)
+            self.threads[slot] = current_thread().name
+            self.count += 1
+
+    def reset(self, state: dict, version: int):
+        """Starts over from state, e.g. after GVL.initialise replaced it."""
+        with self.lock:
+            self.count = 0
+            self.base = {key: summarize(value) for key, value in state.items()}
+            self.base_version = version
+            self.base_time = time.time()
+
+    def _slots(self):
+        # retained slots, oldest first
+        start = self.count - min(self.count, self.capacity)
+        return [i % self.capacity for i in range(start, self.count)]
+
+    def _entry(self, slot: int) -> dict:
+        return {
+            "time": self.times[slot],
+            "version": self.versions[slot],
+            "key": self.keys[slot],
+            "old": self.old[slot],
+            "new": self.new[slot],
+            "thread": self.threads[slot],
+        }
+
+    def changes_since(self, version: int) -> list[dict]:
+        """Retained changes committed after version, oldest first."""
+        with self.lock:
+            return [self._entry(slot) for slot in self._slots() if self.versions[slot] > version]
+
+    def oldest_version(self) -> int:
+        """Earliest version state_at() can rebuild."""
+        with self.lock:
+            return self.base_version
+
+    def state_at(self, version: int = None, timestamp: float = None) -> dict:
+        """
+        Summaries of every key as of version (or of wall time timestamp), the latest state if neither is
+        given. Raises ValueError for a point older than the ring still covers.
+        """
+        with self.lock:
+            if version is not None and version < self.base_version:
+                raise ValueError(f"version {version} is older than the journal (oldest {self.base_version})")
+            if timestamp is not None and timestamp < self.base_time:
+                raise ValueError("timestamp is older than the journal")
+            state = dict(self.base)
+            for slot in self._slots():
+                if version is not None and self.versions[slot] > version:
+                    break
+                if timestamp is not None and self.times[slot] > timestamp:
+                    break
+                state[self.keys[slot]] = self.new[slot]
+            return state
+
+    def format(self, since: int = 0) -> str:
+        """Human readable listing of the retained changes after version since."""
+        return "\n".join(
+            f"{datetime.fromtimestamp(c['time']).strftime('%H:%M:%S.%f')[:-3]} v{c['version']} [{c['thread']}] "
+            f"{c['key']}: {c['old']!r} -> {c['new']!r}"
+            for c in self.changes_since(since)
+        )
+
+    def __len__(self):
+        return min(self.count, self.capacity)
@@ -0,0 +1,84 @@
+import reprlib
+import threading
+import tkinter as tk
+from tkinter import ttk
+from GlobalVariableManager import GVL
+
+MONITOR_FRAME_MS = 50  # at most one repaint per frame, however many changes arrive
+MONITOR_VALUE_LENGTH = 120  # characters shown per value
+
+# bounded repr: a large map or path is cut off while it is formatted, not after
+_value_repr = reprlib.Repr()
+_value_repr.maxlevel = 3
+_value_repr.maxlist = _value_repr.maxtuple = _value_repr.maxset = 8
+_value_repr.maxdict = 6
+_value_repr.maxstring = _value_repr.maxother = MONITOR_VALUE_LENGTH
+
+
+def preview(value) -> str:
+    text = value if isinstance(value, str) else _value_repr.repr(value)
+    return text if len(text) <= MONITOR_VALUE_LENGTH else text[:MONITOR_VALUE_LENGTH - 3] + "..."
+
+
+class GVLMonitor:
+    def __init__(self, root):
+        self.root = root
+        self.rows: dict = {}  # GVL key -> Treeview item
+        self.shown_version = -1
+        self.repaint_lock = threading.Lock()
+        self.repaint_scheduled = False
+        self.root.title("GVL Monitor")
+        self.root.geometry("500x400")
+
+        # Create frame and table
+        self.frame = ttk.Frame(root)
+        self.frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        self.tree = ttk.Treeview(self.frame, columns=("Variable", "Value"), show="headings")
+        self.tree.heading("Variable", text="Variable")
+        self.tree.heading("Value", text="Value")
+        self.tree.column("Variable", width=150)
+        self.tree.column("Value", width=300)
+        self.tree.pack(fill=tk.BOTH, expand=True)
+
+        # Register update callback safely
+        GVL.subscribe(None, self.safe_update_values)
+        self.update_values()  # Initial load
+
+    def safe_update_values(self, keys=None, version=None):
+        """Safe wrapper to avoid recursion issues in Tkinter."""
+        with self.repaint_lock:
+            if self.repaint_scheduled:
+                return  # the repaint already scheduled will show this change too
+            self.repaint_scheduled = True
+        self.root.after(MONITOR_FRAME_MS, self.update_values)  # Schedule update in Tkinter's event loop
+
+    def update_values(self):
+        """Updates the rows of the keys that changed since the last repaint"""
+        with self.repaint_lock:
+            self.repaint_scheduled = False
+        snapshot = GVL.snapshot()
+
+        for key in snapshot.changed_since(self.shown_version):
+            values = (key, preview(snapshot.state[key]))
+            row = self.rows.get(key)
+            if row is None:
+                self.rows[key] = self.tree.insert("", "end", values=values)
+            else:
+                self.tree.item(row, values=values)
+
+        # Remove keys dropped by GVL.initialise
+        for key in self.rows.keys() - snapshot.state.keys():
+            self.tree.delete(self.rows.pop(key))
+        self.shown_version = snapshot.version
+
+
+class GVLMonitorRunner:
+    def __init__(self):
+        pass
+    
+    @staticmethod
+    def run_GVL_monitor():
+        root = tk.Tk()
+        app = GVLMonitor(root)
+        root.mainloop()
@@ -1,8 +1,14 @@
-from typing import cast
+from contextlib import contextmanager
+from types import MappingProxyType
+from typing import Callable, Iterable, NamedTuple, cast
 from typing_extensions import TypedDict 
+import itertools
 import logging
+import threading
 
+from GVLJournal import GVLJournal
 from Logger import createLogger
+from config import GVL_JOURNAL_SIZE
 
 class GVLState(TypedDict):
     stm_ack: bool
@@ -16,7 +22,35 @@ class GVLState(TypedDict):
     obstacleIdSequence:list
     logger: logging.Logger
 
+class GVLSnapshot(NamedTuple):
+    """Read-only view of GVL at one version. key_versions holds the version each key last changed at."""
+    version: int
+    state: MappingProxyType
+    key_versions: MappingProxyType
+
+    def changed_since(self, version: int) -> list:
+        """Keys changed after version."""
+        return [key for key, changed in self.key_versions.items() if changed > version]
+
+
+class GVLTransaction:
+    """Writes buffered by GVL.transaction(), reads see them before GVL does."""
+    __slots__ = ("_changes",)
+
+    def __init__(self):
+        object.__setattr__(self, "_changes", {})
+
+    def __setattr__(self, key, value):
+        self._changes[key] = value
+
+    def __getattr__(self, key):
+        if key in self._changes:
+            return self._changes[key]
+        return getattr(GVL(), key)
+
+
 class GVL:
+    __slots__ = ()  # all state lives in _shared_borg_state, reached through __getattr__/__setattr__
     _shared_borg_state: GVLState = cast(GVLState,{
             "stm_ack": False,
             "algo_ack": False,
@@ -30,31 +64,71 @@ class GVL:
             "logger": createLogger(),
         })  # Shared state across all instances
     _callbacks = []  # List of functions to call on update
+    _subscribers: dict = {}  # subscription id -> (keys or None for every key, callback(keys, version))
+    _subscription_ids = itertools.count(1)
+    _version = 0  # bumped on every committed change
+    _key_versions: dict = dict.fromkeys(_shared_borg_state, 0)  # key -> version it last changed at
+    _snapshot: GVLSnapshot = None  # cached until the next change
+    _journal = GVLJournal(GVL_JOURNAL_SIZE, _shared_borg_state)  # last committed changes, for debugging a run
+    _lock = threading.RLock()  # Guards commits to the shared state
+    _condition = threading.Condition(_lock)  # Wakes waiters as soon as a change is committed
 
-    def __new__(cls, *args, **kwargs):
-        obj = super(GVL, cls).__new__(cls, *args, **kwargs)
-        obj.__dict__ = cls._shared_borg_state
-        return obj
-    
     @staticmethod
     def initialise(dic: dict):
         """Initialize GVL state."""
-        GVL._shared_borg_state = dic
+        with GVL._condition:
+            GVL._journal.reset(dic, GVL._version + 1)
+            GVL._shared_borg_state = dic
+            GVL._version += 1
+            GVL._key_versions = dict.fromkeys(dic, GVL._version)
+            GVL._snapshot = None
+            GVL._condition.notify_all()
+        GVL._run_callbacks(frozenset(dic))
 
     def __setattr__(self, key, value):
         """Detects changes in GVL and triggers callbacks, but prevents infinite recursion."""
-        if key in self._shared_borg_state and self._shared_borg_state[key] == value:
-            return  # No actual change, avoid triggering callbacks
+        if GVL._commit(key, value):
+            GVL._run_callbacks(frozenset((key,)))
 
-        # Update the shared state
-        self._shared_borg_state[key] = value
+    @staticmethod
+    def _commit(key, value) -> bool:
+        """Writes a value and wakes any waiters, returns False if nothing changed."""
+        return bool(GVL._commit_many({key: value}))
 
-        # Trigger registered callbacks
+    @staticmethod
+    def _commit_many(changes: dict) -> frozenset:
+        """Writes all values under one version and wakes any waiters once, returns the keys that changed."""
+        with GVL._condition:
+            state = GVL._shared_borg_state
+            changed = frozenset(key for key, value in changes.items() if key not in state or state[key] != value)
+            if not changed:
+                return changed  # No actual change, avoid triggering callbacks
+
+            # Update the shared state
+            GVL._version += 1
+            for key in changed:
+                GVL._journal.record(GVL._version, key, state.get(key), changes[key])
+                state[key] = changes[key]
+                GVL._key_versions[key] = GVL._version
+            GVL._snapshot = None
+            GVL._condition.notify_all()
+            return changed
+
+    @staticmethod
+    def _run_callbacks(keys: frozenset):
+        """Trigger registered callbacks, outside the lock so they may read or write GVL."""
         for callback in GVL._callbacks:
             try:
                 callback()
             except RecursionError:
-                print(f"Warning: Skipping recursive callback for {key}")
+                print(f"Warning: Skipping recursive callback for {set(keys)}")
+        version = GVL._version
+        for subscribed, callback in list(GVL._subscribers.values()):
+            if subscribed is None or not subscribed.isdisjoint(keys):
+                try:
+                    callback(keys if subscribed is None else keys & subscribed, version)
+                except RecursionError:
+                    print(f"Warning: Skipping recursive subscriber for {set(keys)}")
 
     def __getattr__(self, key):
         """Retrieve attributes from the shared GVL state."""
@@ -67,57 +141,105 @@ class GVL:
         """Allows external functions (e.g., GUI updates) to register for state changes."""
         GVL._callbacks.append(callback)
 
+    @staticmethod
+    def subscribe(keys: Iterable[str], callback: Callable[[frozenset, int], None]) -> int:
+        """
+        Calls callback(changed keys, version) after a change to any of keys, None subscribes to every key.
+        Runs on the writer's thread, so it should only hand the work off. Returns an id for unsubscribe().
+        """
+        subscription = next(GVL._subscription_ids)
+        GVL._subscribers[subscription] = (frozenset(keys) if keys is not None else None, callback)
+        return subscription
 
+    @staticmethod
+    def unsubscribe(subscription: int):
+        GVL._subscribers.pop(subscription, None)
 
+    @staticmethod
+    def version() -> int:
+        return GVL._version
 
-import tkinter as tk
-from tkinter import ttk
-from GlobalVariableManager import GVL
-
-class GVLMonitor:
-    def __init__(self, root):
-        self.root = root
-        self.root.title("GVL Monitor")
-        self.root.geometry("500x400")
-
-        # Create frame and table
-        self.frame = ttk.Frame(root)
-        self.frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-
-        self.tree = ttk.Treeview(self.frame, columns=("Variable", "Value"), show="headings")
-        self.tree.heading("Variable", text="Variable")
-        self.tree.heading("Value", text="Value")
-        self.tree.column("Variable", width=150)
-        self.tree.column("Value", width=300)
-        self.tree.pack(fill=tk.BOTH, expand=True)
+    @staticmethod
+    def journal() -> GVLJournal:
+        """Ring of the last committed changes, see changes_since() and state_at()."""
+        return GVL._journal
 
-        # Register update callback safely
-        GVL.register_callback(self.safe_update_values)
-        self.update_values()  # Initial load
+    @staticmethod
+    def snapshot() -> GVLSnapshot:
+        """Immutable view of the current state, copied at most once per version."""
+        with GVL._lock:
+            snapshot = GVL._snapshot
+            if snapshot is None:
+                snapshot = GVL._snapshot = GVLSnapshot(
+                    GVL._version,
+                    MappingProxyType(dict(GVL._shared_borg_state)),
+                    MappingProxyType(dict(GVL._key_versions)),
+                )
+            return snapshot
 
-    def safe_update_values(self):
-        """Safe wrapper to avoid recursion issues in Tkinter."""
-        self.root.after(100, self.update_values)  # Schedule update in Tkinter's event loop
+    @staticmethod
+    def wait_until(condition: Callable[[], bool], timeout: float = None) -> bool:
+        """Blocks until condition() holds, re-checking on every committed change. Returns False on timeout."""
+        with GVL._condition:
+            return bool(GVL._condition.wait_for(condition, timeout))
 
-    def update_values(self):
-        """Updates the UI when GVL changes"""
-        gvl = GVL()._shared_borg_state
+    @staticmethod
+    def wait_for(key, predicate: Callable[[object], bool] = bool, timeout: float = None) -> bool:
+        """Blocks until predicate(value of key) holds. Returns False on timeout."""
+        return GVL.wait_until(lambda: predicate(GVL._shared_borg_state.get(key)), timeout)
 
-        # Clear old values
-        for row in self.tree.get_children():
-            self.tree.delete(row)
+    @staticmethod
+    def compare_and_set(key, expected, value) -> bool:
+        """Sets key to value only if it currently equals expected, in one step. Returns whether it did."""
+        with GVL._condition:
+            if GVL._shared_borg_state.get(key) != expected:
+                return False
+            changed = GVL._commit(key, value)
+        if changed:
+            GVL._run_callbacks(frozenset((key,)))
+        return True
 
-        # Insert updated values
-        for key, value in gvl.items():
-            self.tree.insert("", "end", values=(key, str(value)))
+    @staticmethod
+    def get_and_clear(key, cleared=None):
+        """Returns the current value of key and replaces it with cleared, in one step."""
+        with GVL._condition:
+            value = GVL._shared_borg_state.get(key)
+            changed = GVL._commit(key, cleared)
+        if changed:
+            GVL._run_callbacks(frozenset((key,)))
+        return value
 
+    @staticmethod
+    @contextmanager
+    def transaction():
+        """
+        with GVL.transaction() as tx: tx.a = 1; tx.b = 2
+        Buffers the writes and commits them together when the block ends: waiters and readers never see
+        only some of them, and callbacks run once for all changed keys. Nothing is written if the block
+        raises. The lock is only held for the commit itself, not while the block runs.
+        """
+        tx = GVLTransaction()
+        yield tx
+        changed = GVL._commit_many(tx._changes)
+        if changed:
+            GVL._run_callbacks(changed)
 
-class GVLMonitorRunner:
-    def __init__(self):
-        pass
-    
     @staticmethod
-    def run_GVL_monitor():
-        root = tk.Tk()
-        app = GVLMonitor(root)
-        root.mainloop()
+    def consume_flag(key, timeout: float = None, reset=False) -> bool:
+        """Atomically waits for a truthy flag and resets it, so each set is consumed exactly once.
+        timeout=0 checks without blocking. Returns False if the flag was not set in time."""
+        with GVL._condition:
+            if not GVL._condition.wait_for(lambda: GVL._shared_borg_state.get(key), timeout):
+                return False
+            changed = GVL._commit(key, reset)
+        if changed:
+            GVL._run_callbacks(frozenset((key,)))
+        return True
+
+
+def __getattr__(name):
+    # the Tk monitor lives in GVLMonitor.py, so importing GVL does not pull in tkinter
+    if name in ("GVLMonitor", "GVLMonitorRunner", "preview"):
+        from LazyImport import lazy_import
+        return getattr(lazy_import("GVLMonitor"), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
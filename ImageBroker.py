@@ -3,10 +3,10 @@ import struct
 import threading
 import io
 import time
-import picamera
 from multiprocessing import Process
 
 from GlobalVariableManager import GVL
+from LazyImport import lazy_import
 
 # Constants
 PACKET_SIZE = 1300  # UDP packet size < 1500 bytes (safe for most networks)
@@ -23,7 +23,8 @@ class ImageBroker:
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
 
-        # Initialize PiCamera
+        # Initialize PiCamera, imported here so only the stream process loads it
+        picamera = lazy_import("picamera")
         self.camera = picamera.PiCamera()
         self.camera.resolution = (WIDTH, HEIGHT)
         self.camera.framerate = FPS
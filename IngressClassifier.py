@@ -0,0 +1,62 @@
+import re
+
+from Codec import codec
+from CommandParser import CommandParser
+from Messages import Message, StmAck, message_from_dict
+
+# {"from": "<sender>", "msg": {"type": "<type>", ... with any whitespace, read without decoding the payload
+_HEADER = re.compile(r'\s*\{\s*"from"\s*:\s*"([^"\\]*)"\s*,\s*"msg"\s*:\s*\{\s*"type"\s*:\s*"([^"\\]*)"')
+# the whole of a well-formed STM ack, {"from": "stm", "msg": {"type": "ack"} or with a "seq": <int> after the type
+_ACK = re.compile(r'\s*\{\s*"from"\s*:\s*"stm"\s*,\s*"msg"\s*:\s*\{\s*"type"\s*:\s*"ack"\s*(?:,\s*"seq"\s*:\s*(\d+)\s*)?\}\s*\}\s*')
+
+
+class Envelope:
+    """A classified message. The payload is only decoded, into its typed Message, when a handler reads msg."""
+    __slots__ = ("raw", "sender", "type", "_msg")
+
+    def __init__(self, raw: str, sender: str, msg_type: str, msg: Message = None):
+        self.raw = raw
+        self.sender = sender
+        self.type = msg_type
+        self._msg = msg
+
+    @property
+    def msg(self) -> Message:
+        if self._msg is None:
+            self._msg = codec.decode_message(self.raw)[1]
+        return self._msg
+
+    def seq(self):
+        """
+        Sequence number of an ack, None if it has none. The usual ack is matched as a whole without decoding,
+        anything else is decoded. Raises ValueError if the message is not a valid ack.
+        """
+        match = _ACK.fullmatch(self.raw)
+        if match:
+            return int(match.group(1)) if match.group(1) else None
+        try:
+            msg = self.msg
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"malformed ack: {e!r}") from e
+        if not isinstance(msg, StmAck):
+            raise ValueError(f"not an ack: {msg!r}")
+        return msg.seq
+
+
+def classify(raw: str) -> Envelope:
+    """
+    Reads the sender and msg type from the message header. Messages whose header is not in the
+    usual key order fall back to a full decode. Returns None for messages without a sender or with
+    a malformed payload.
+    """
+    match = _HEADER.match(raw)
+    if match:
+        return Envelope(raw, match.group(1), match.group(2))
+    res = CommandParser.json_decode(raw)
+    if not isinstance(res, dict) or "from" not in res or not isinstance(res.get("msg"), dict):
+        return None
+    msg = res["msg"]
+    try:
+        return Envelope(raw, res["from"], msg.get("type"), message_from_dict(msg))
+    except (KeyError, TypeError, ValueError):
+        return None
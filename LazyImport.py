@@ -0,0 +1,31 @@
+import importlib
+import sys
+import time
+from threading import Lock
+
+# module name -> seconds its first lazy_import took, for profiling startup
+import_times: dict = {}
+_lock = Lock()
+
+
+def lazy_import(name: str):
+    """
+    Imports a hardware or GUI module (bluetooth, picamera, tkinter, ...) when a subsystem first needs it
+    instead of when main.py is loaded, and records how long the import took.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    with _lock:
+        started = time.perf_counter()
+        module = importlib.import_module(name)
+        import_times.setdefault(name, time.perf_counter() - started)
+    return module
+
+
+def import_report() -> str:
+    """One line per lazily imported module, slowest first."""
+    return ", ".join(
+        f"{name} {seconds * 1000:.1f} ms"
+        for name, seconds in sorted(import_times.items(), key=lambda item: item[1], reverse=True)
+    ) or "none"
@@ -0,0 +1,120 @@
+class Message:
+    """Base of the typed protocol messages, each kind carries its msg type as a class attribute."""
+    __slots__ = ()
+    type: str = None
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class StmAck(Message):
+    """{"type": "ack", "seq": <seq>}, seq is None for the plain stop-and-wait ack."""
+    __slots__ = ("seq",)
+    type = "ack"
+
+    def __init__(self, seq: int = None):
+        self.seq = seq
+
+    @classmethod
+    def from_dict(cls, msg: dict):
+        seq = msg.get("seq")
+        return cls(int(seq) if seq is not None else None)
+
+
+class AlgoData(Message):
+    """Arena map sent by Android, forwarded as is to the algo server. msg is the whole msg dict Android sent."""
+    __slots__ = ("data", "msg")
+    type = "algo-data"
+
+    def __init__(self, data: dict, msg: dict = None):
+        self.data = data
+        self.msg = msg if msg is not None else {"type": self.type, "data": data}
+
+    @classmethod
+    def from_dict(cls, msg: dict):
+        return cls(msg["data"], msg)
+
+    def to_dict(self) -> dict:
+        """The msg exactly as Android sent it, including fields the RPi does not use."""
+        return self.msg
+
+
+class AndroidCommand(Message):
+    """{"type": "command", "data": {"taskId": ..., "instruction": ...}}"""
+    __slots__ = ("task_id", "instruction")
+    type = "command"
+
+    def __init__(self, task_id: int, instruction: str):
+        self.task_id = task_id
+        self.instruction = instruction
+
+    @classmethod
+    def from_dict(cls, msg: dict):
+        return cls.from_data(msg["data"])
+
+    @classmethod
+    def from_data(cls, data: dict):
+        return cls(int(data["taskId"]), data.get("instruction"))
+
+    @property
+    def start(self) -> bool:
+        return self.instruction == "start"
+
+
+class AlgoPath(Message):
+    """Path from the algo server: movement segments, obstacle visiting order and coordinates."""
+    __slots__ = ("data", "sequence", "coordinates", "request_id")
+    type = "path"
+
+    def __init__(self, data: list, sequence: list, coordinates: list, request_id: int = None):
+        self.data = data
+        self.sequence = sequence
+        self.coordinates = coordinates
+        self.request_id = request_id
+
+    @classmethod
+    def from_dict(cls, msg: dict):
+        return cls(msg["data"], msg.get("sequence"), msg.get("coordinates"), msg.get("requestId"))
+
+
+class PredictionResult(Message):
+    """Result of a "predict" request to the image server."""
+    __slots__ = ("data", "request_id")
+    type = "prediction-result"
+
+    def __init__(self, data, request_id: int = None):
+        self.data = data
+        self.request_id = request_id
+
+    @classmethod
+    def from_dict(cls, msg: dict):
+        return cls(msg.get("data"), msg.get("requestId"))
+
+
+class RawMessage(Message):
+    """Any other msg, kept as its decoded dict."""
+    __slots__ = ("type", "msg")
+
+    def __init__(self, msg_type: str, msg: dict):
+        self.type = msg_type
+        self.msg = msg
+
+    @property
+    def request_id(self):
+        return self.msg.get("requestId")
+
+
+MESSAGE_TYPES: dict[str, type] = {
+    cls.type: cls for cls in (StmAck, AlgoData, AndroidCommand, AlgoPath, PredictionResult)
+}
+
+
+def message_from_dict(msg: dict) -> Message:
+    """Typed message for a decoded msg dict, RawMessage for unknown kinds."""
+    if not isinstance(msg, dict):
+        return RawMessage(None, {})
+    cls = MESSAGE_TYPES.get(msg.get("type"))
+    if cls is None:
+        return RawMessage(msg.get("type"), msg)
+    return cls.from_dict(msg)
@@ -0,0 +1,177 @@
+import time
+
+from GlobalVariableManager import GVL
+from config import *
+
+
+class MissionExecutor:
+    """Runs a parsed STM instruction queue with Android status updates kept off the motion critical path."""
+
+    def __init__(self, stm_broker, android_broker, image_prediction_broker, ack_timeout: float = STM_ACK_TIMEOUT):
+        self.stm_broker = stm_broker
+        self.android_broker = android_broker
+        self.image_prediction_broker = image_prediction_broker
+        self.ack_timeout = ack_timeout
+        self.timings: list[dict] = []
+
+    def post_status(self, send, *args):
+        """Android status sends only queue on the broker's writer thread, so the caller never waits on Bluetooth."""
+        try:
+            send(*args)
+        except Exception as e:
+            GVL().logger.error(f"Failed to send status to Android: {e}")
+
+    def flush_status(self):
+        """Waits up to ANDROID_FLUSH_TIMEOUT for the queued statuses to be written, so the mission never hangs on Android."""
+        if not self.android_broker.writer.attached:
+            return  # no Android connected, the statuses wait for the next connection
+        if not self.android_broker.flush(ANDROID_FLUSH_TIMEOUT):
+            GVL().logger.warning(f"Android statuses still queued after {ANDROID_FLUSH_TIMEOUT}s, finishing the mission anyway")
+
+    def _encode_next(self, instructions: list, idx: int):
+        """Pre-encodes the next motion command, None if the next step is a scan or there is none."""
+        if idx < len(instructions) and instructions[idx][0] != "P":
+            return self.stm_broker.encode(instructions[idx])
+        return None
+
+    def _wait_for_ack(self, instruction: str):
+        """Waits for the STM ack of the command in flight, warning (but still waiting) on every timeout."""
+        while not GVL.consume_flag("stm_ack", timeout=self.ack_timeout):
+            GVL().logger.warning(f"No STM ack for {instruction} after {self.ack_timeout}s, still waiting")
+
+    def _scan(self, x: float, y: float, obstacle_id):
+        """Stops for an image prediction and reports the obstacle to Android."""
+        gvl = GVL()
+        gvl.predicted_image = None
+        gvl.logger.info("Scanning Image")
+        # both link classes answer with the matching prediction-result, no polling of GVL
+        try:
+            result = self.image_prediction_broker.predict(PREDICT_TIMEOUT)
+            gvl.logger.info(f"Predicted image: {result.data}")
+        except (OSError, TimeoutError, ValueError) as e:
+            gvl.logger.error(f"Image prediction failed: {e}")
+        self.post_status(self.android_broker.send_obstacle_image_found, x, y, 'N', obstacle_id, 21)
+        time.sleep(SCAN_SETTLE_TIME)
+
+    def execute(self, instructions: list, coordinates: list, obstacle_ids: list) -> list[dict]:
+        """
+        Runs every instruction in order and returns the per-step timings.
+        The next STM command is encoded while the current one runs, so the write follows the ack directly.
+        """
+        gvl = GVL()
+        instructions = list(instructions)
+        self.timings = []
+        if self.stm_broker.window is not None:
+            return self._execute_windowed(instructions, coordinates, obstacle_ids)
+        coordinates_idx = 0
+        obstacle_idx = 0
+        next_payload = self._encode_next(instructions, 0)
+        last_ack = None
+
+        for idx, instruction in enumerate(instructions):
+            x, y = coordinates[coordinates_idx]
+            x, y = x / 10, y / 10
+
+            if instruction[0] == "P":
+                self.post_status(self.android_broker.send_scanning, x, y, 'N')
+                started = time.perf_counter()
+                self._scan(x, y, obstacle_ids[obstacle_idx])
+                obstacle_idx += 1
+                self.timings.append({
+                    "step": idx,
+                    "command": instruction,
+                    "scan_ms": (time.perf_counter() - started) * 1000,
+                })
+                next_payload = self._encode_next(instructions, idx + 1)
+                last_ack = None
+                continue
+
+            payload = next_payload if next_payload is not None else self.stm_broker.encode(instruction)
+            GVL.get_and_clear("stm_ack", False)  # drop any stale ack before the write
+            sent = time.perf_counter()
+            self.stm_broker.send_encoded(payload)
+            gvl.logger.info(f"Sending instruction: {instruction}")
+
+            # everything below overlaps with the robot moving
+            self.post_status(self.android_broker.send_moving, x, y, 'N')
+            coordinates_idx += 1
+            encode_started = time.perf_counter()
+            next_payload = self._encode_next(instructions, idx + 1)
+            encode_ms = (time.perf_counter() - encode_started) * 1000
+
+            self._wait_for_ack(instruction)
+            acked = time.perf_counter()
+            self.timings.append({
+                "step": idx,
+                "command": instruction,
+                "ack_to_send_ms": (sent - last_ack) * 1000 if last_ack is not None else None,
+                "encode_next_ms": encode_ms,
+                "round_trip_ms": (acked - sent) * 1000,
+            })
+            last_ack = acked
+
+        self.flush_status()
+        self.log_timings()
+        return self.timings
+
+    def _execute_windowed(self, instructions: list, coordinates: list, obstacle_ids: list) -> list[dict]:
+        """Streams motion commands through the STM window, draining it only at scan points."""
+        window = self.stm_broker.window
+
+        def record_ack(seq, command, round_trip, retransmits, step):
+            self.timings.append({
+                "step": step,
+                "command": command,
+                "seq": seq,
+                "round_trip_ms": round_trip * 1000,
+                "retransmits": retransmits,
+            })
+
+        window.on_ack = record_ack
+        coordinates_idx = 0
+        obstacle_idx = 0
+        x = y = 0
+        try:
+            for idx, instruction in enumerate(instructions):
+                x, y = coordinates[coordinates_idx]
+                x, y = x / 10, y / 10
+
+                if instruction[0] == "P":
+                    # the robot has to be standing at the scan point
+                    window.drain()
+                    self.post_status(self.android_broker.send_scanning, x, y, 'N')
+                    started = time.perf_counter()
+                    self._scan(x, y, obstacle_ids[obstacle_idx])
+                    obstacle_idx += 1
+                    self.timings.append({
+                        "step": idx,
+                        "command": instruction,
+                        "scan_ms": (time.perf_counter() - started) * 1000,
+                    })
+                    continue
+
+                self.stm_broker.send_windowed(instruction, tag=idx)
+                self.post_status(self.android_broker.send_moving, x, y, 'N')
+                coordinates_idx += 1
+            window.drain()
+        except TimeoutError as e:
+            GVL().logger.error(f"Aborting mission: {e}")
+            window.reset()
+            self.post_status(self.android_broker.send_error, x, y, 'N')
+        finally:
+            window.on_ack = None
+
+        self.flush_status()
+        self.log_timings()
+        return self.timings
+
+    def log_timings(self):
+        """Logs a summary of the last run's per-step timings."""
+        gaps = [t["ack_to_send_ms"] for t in self.timings if t.get("ack_to_send_ms") is not None]
+        trips = [t["round_trip_ms"] for t in self.timings if "round_trip_ms" in t]
+        if not trips:
+            return
+        GVL().logger.info(
+            f"Mission: {len(self.timings)} steps, STM round trip avg {sum(trips) / len(trips):.1f}ms "
+            f"max {max(trips):.1f}ms, ack-to-send gap max {max(gaps, default=0.0):.3f}ms"
+        )
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import itertools
+import time
+from collections import OrderedDict, deque
+from threading import Lock
+
+
+def _canonical(value, key=None):
+    # obstacles are a set, the order Android lists them in does not change the plan
+    if isinstance(value, dict):
+        return {k: _canonical(v, k) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        items = [_canonical(v) for v in value]
+        if key == "obstacles":
+            items.sort(key=lambda item: json.dumps(item, sort_keys=True))
+        return items
+    return value
+
+
+class PathCache:
+    """
+    Algo server paths keyed by a hash of the map they were planned for, least recently used entries are
+    evicted first. With store_path set, entries are also kept in a JSON file and survive restarts.
+    Requests sent to the algo server are remembered in order, each with a requestId. A path response that
+    echoes the requestId is stored under its own map. One without it is only stored when a single request
+    is unanswered, so a lost or failed request never gets another map's path filed under it.
+    """
+
+    def __init__(self, max_entries: int = 32, store_path: str = None, pending_timeout: float = 30.0):
+        self.max_entries = max_entries
+        self.store_path = store_path
+        self.pending_timeout = pending_timeout
+        self.lock = Lock()
+        self.entries: OrderedDict[str, dict] = OrderedDict()
+        self.pending: deque[tuple[str, float, int]] = deque()  # (key, sent at, requestId) of unanswered requests, oldest first
+        self.request_ids = itertools.count(1)
+        self.hits = 0
+        self.misses = 0
+        self.merged = 0
+        if store_path:
+            self._load()
+
+    @staticmethod
+    def key(map_data) -> str:
+        """sha256 of the map, independent of key and obstacle order."""
+        canonical = json.dumps(_canonical(map_data), sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def lookup(self, key: str) -> dict:
+        """Cached path for key, None on a miss."""
+        with self.lock:
+            path = self.entries.get(key)
+            if path is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return path
+
+    def begin(self, key: str) -> int:
+        """
+        Records a request for key and returns the requestId to send it with. Returns None when the same map
+        is already waiting for its path, so the caller does not send it again; a request unanswered for
+        pending_timeout no longer counts.
+        """
+        now = time.monotonic()
+        with self.lock:
+            if any(k == key and now - sent < self.pending_timeout for k, sent, _ in self.pending):
+                self.merged += 1
+                return None
+            request_id = next(self.request_ids)
+            self.pending.append((key, now, request_id))
+            return request_id
+
+    def abandon(self, request_id: int):
+        """Forgets a request that could not be sent, so the map is sent again next time."""
+        with self.lock:
+            self.pending = deque(entry for entry in self.pending if entry[2] != request_id)
+
+    def clear_pending(self):
+        """Forgets every unanswered request, e.g. when the algo link (re)connects and they can no longer be answered."""
+        with self.lock:
+            self.pending.clear()
+
+    def complete(self, path: dict, request_id: int = None) -> str:
+        """
+        Stores a path response under the request it answers. Returns its key, None if it could not be
+        matched to exactly one unanswered request.
+        """
+        now = time.monotonic()
+        with self.lock:
+            # a request unanswered for pending_timeout is taken as lost, so a late path is never filed under it
+            while self.pending and now - self.pending[0][1] >= self.pending_timeout:
+                self.pending.popleft()
+            if request_id is not None:
+                entry = next((entry for entry in self.pending if entry[2] == request_id), None)
+                if entry is None:
+                    return None
+                self.pending.remove(entry)
+            elif len(self.pending) == 1:
+                entry = self.pending.popleft()
+            else:
+                # without a requestId the path cannot be told apart, the oldest request is taken as answered
+                if self.pending:
+                    self.pending.popleft()
+                return None
+            key = entry[0]
+            self.entries[key] = path
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            if self.store_path:
+                self._save()
+        return key
+
+    def _load(self):
+        try:
+            with open(self.store_path, encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return
+        for key, path in list(stored.items())[-self.max_entries:]:
+            self.entries[key] = path
+
+    def _save(self):
+        # written to a temporary file first so a crash never leaves a truncated store
+        tmp = f"{self.store_path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f)
+            os.replace(tmp, self.store_path)
+        except OSError:
+            pass
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "pending": len(self.pending),
+                "hits": self.hits,
+                "misses": self.misses,
+                "merged": self.merged,
+            }
+
+    def __repr__(self):
+        return f"PathCache({self.stats()})"
@@ -4,6 +4,9 @@ from typing import Callable
 from Broker import Broker
 from serial import Serial
 from GlobalVariableManager import GVL
+from Messages import Message, StmAck
+from STMWindow import STMCommandWindow
+import STMFrame
 from config import *
 import json
 
@@ -30,10 +33,22 @@ def send_command(command):
             print(f"[TCP ERROR] Failed to receive response: {e}")
 
 class STMBroker(Broker):
-    def __init__(self, com_port=COM_PORT, baud_rate=BAUD_RATE):
+    def __init__(self, com_port=COM_PORT, baud_rate=BAUD_RATE, window_size=STM_WINDOW_SIZE, protocol=STM_PROTOCOL):
+        assert protocol in ("ascii", "binary"), f"unknown STM protocol {protocol}"
         self.com_port = com_port
         self.baud_rate = baud_rate
         self.serial_conn = None
+        # "binary" uses 6-byte STMFrame frames both ways instead of ASCII commands and JSON ack lines
+        self.protocol = protocol
+        self.frame_decoder = STMFrame.STMFrameDecoder()
+        self.next_seq = 0  # sequence numbers for binary stop-and-wait frames
+        # window_size > 1 streams sequence-numbered commands instead of stop-and-wait
+        self.window: STMCommandWindow = None
+        if window_size > 1:
+            self.window = STMCommandWindow(
+                self._write_sequenced, window_size,
+                retransmit_timeout=STM_RETRANSMIT_TIMEOUT, max_retransmits=STM_MAX_RETRANSMITS,
+            )
         # self.connect()
     def connect(self) -> int:
         try:
@@ -48,9 +63,36 @@ class STMBroker(Broker):
         if self.serial_conn:
             #
             self.serial_conn.flush()
-            self.serial_conn.write(message.encode())
+            self.serial_conn.write(self.encode(message))
             # print(f"Sent: {message}")
 
+    def encode(self, message: str) -> bytes:
+        """Encodes a command ahead of time so it can be written the moment the STM is ready."""
+        if self.protocol == "binary":
+            seq = self.next_seq
+            self.next_seq = (seq + 1) % 256
+            return STMFrame.encode_command(message, seq)
+        return message.encode()
+
+    def send_encoded(self, payload: bytes) -> None:
+        """Writes a pre-encoded command straight to the serial port."""
+        if self.serial_conn:
+            self.serial_conn.write(payload)
+
+    def encode_sequenced(self, seq: int, message: str) -> bytes:
+        """Windowed framing: three-digit sequence number followed by the 5-character command, e.g. 007FW010."""
+        if self.protocol == "binary":
+            return STMFrame.encode_command(message, seq)
+        return f"{seq:03d}{message}".encode()
+
+    def _write_sequenced(self, seq: int, message: str) -> None:
+        self.send_encoded(self.encode_sequenced(seq, message))
+
+    def send_windowed(self, message: str, tag=None) -> int:
+        """Streams a command through the window, blocking only while the window is full. Returns its sequence number."""
+        assert self.window is not None, "windowed mode is disabled (window_size <= 1)"
+        return self.window.submit(message, tag)
+
     def send_rot(self, message: str) -> None:
         # look last 3 letters
         numeric = float(message[2:])
@@ -82,23 +124,47 @@ class STMBroker(Broker):
         return 0
     
     def run_until_death(self, callback: Callable[[str], None] = None):
+        if self.protocol == "binary":
+            return self.run_binary_until_death()
         while True:
             message = self.receive()
             if message:
                 if callback:
                     callback(message)
 
-    def consume(self, message: dict):
+    def run_binary_until_death(self):
+        """Reads binary frames and handles acks right here, without the dispatcher or the JSON parser."""
+        while True:
+            if not self.serial_conn:
+                time.sleep(1)
+                continue
+            data = self.serial_conn.read(self.serial_conn.in_waiting or STMFrame.FRAME_SIZE)
+            if not data:
+                continue
+            for opcode, magnitude, seq in self.frame_decoder.feed(data):
+                if opcode == STMFrame.OP_ACK:
+                    self.on_ack(seq)
+                else:
+                    GVL().logger.warning(f"Unexpected frame from STM: {STMFrame.decode_command(opcode, magnitude)} (seq {seq})")
+
+    def on_ack(self, seq: int = None):
+        """Confirms a command, through the window when one is in use."""
+        if self.window is not None and seq is not None:
+            if not self.window.ack(seq):
+                GVL().logger.debug(f"Ignoring duplicate STM ack for seq {seq}")
+        else:
+            GVL().stm_ack = True
+
+    def consume(self, message: Message):
         # {
         #     "from" : "stm",
         #     "msg" : {
         #         type: "ack",
         #     }
         # }
-        if "type" in message and "ack" == message["type"]:
+        if isinstance(message, StmAck):
             GVL().logger.debug("Acknowledgement received from STM")
-            GVL().stm_ack = True
-        pass
+            self.on_ack(message.seq)
 
 
 if __name__ == "__main__":
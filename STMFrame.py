@@ -0,0 +1,93 @@
+import struct
+
+# Binary STM framing, 6 bytes per frame:
+#   SYNC (0xA5) | opcode (u8) | magnitude (i16, big endian) | seq (u8) | CRC8 of opcode..seq
+SYNC = 0xA5
+FRAME_SIZE = 6
+_BODY = struct.Struct(">BhB")
+
+OPCODES = {
+    "FW": 0x01,  # forward
+    "BW": 0x02,  # backward
+    "AF": 0x03,  # front left
+    "CF": 0x04,  # front right
+    "AB": 0x05,  # back left
+    "CB": 0x06,  # back right
+    "DT": 0x07,  # move until distance
+}
+COMMANDS = {opcode: command for command, opcode in OPCODES.items()}
+OP_ACK = 0x80
+
+
+def _crc8_table(poly: int = 0x07) -> list[int]:
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ poly) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+        table.append(crc)
+    return table
+
+
+CRC8_TABLE = _crc8_table()
+
+
+def crc8(data: bytes) -> int:
+    """CRC-8 (poly 0x07, init 0), same as the STM side."""
+    crc = 0
+    for byte in data:
+        crc = CRC8_TABLE[crc ^ byte]
+    return crc
+
+
+def encode_frame(opcode: int, magnitude: int, seq: int) -> bytes:
+    body = _BODY.pack(opcode, magnitude, seq & 0xFF)
+    return bytes((SYNC,)) + body + bytes((crc8(body),))
+
+
+def encode_command(command: str, seq: int) -> bytes:
+    """Packs a 5-character command such as FW010 into a binary frame."""
+    return encode_frame(OPCODES[command[:2]], int(command[2:]), seq)
+
+
+def decode_command(opcode: int, magnitude: int) -> str:
+    """Turns a decoded frame back into its ASCII command, e.g. for logging."""
+    return f"{COMMANDS.get(opcode, '??')}{abs(magnitude):03d}"
+
+
+# every valid ack frame, so an ack decodes with a single dict lookup
+ACK_FRAMES: dict[bytes, int] = {encode_frame(OP_ACK, 0, seq): seq for seq in range(256)}
+
+
+class STMFrameDecoder:
+    """Incrementally splits a serial byte stream into (opcode, magnitude, seq) frames, resyncing on bad CRC."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.crc_errors = 0
+
+    def feed(self, data: bytes) -> list[tuple[int, int, int]]:
+        buf = self.buffer
+        buf += data
+        frames = []
+        i = 0
+        n = len(buf)
+        while n - i >= FRAME_SIZE:
+            if buf[i] != SYNC:
+                j = buf.find(SYNC, i + 1)
+                i = n if j < 0 else j
+                continue
+            frame = bytes(buf[i:i + FRAME_SIZE])
+            seq = ACK_FRAMES.get(frame)
+            if seq is not None:
+                frames.append((OP_ACK, 0, seq))
+                i += FRAME_SIZE
+                continue
+            if crc8(frame[1:5]) != frame[5]:
+                self.crc_errors += 1
+                i += 1  # not a real frame start, look for the next sync byte
+                continue
+            frames.append(_BODY.unpack_from(frame, 1))
+            i += FRAME_SIZE
+        del buf[:i]
+        return frames
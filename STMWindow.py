@@ -0,0 +1,112 @@
+import time
+from collections import OrderedDict
+from threading import Condition
+from typing import Callable
+
+from GlobalVariableManager import GVL
+
+SEQ_MODULO = 256  # sequence numbers fit in one byte on the wire
+
+
+class STMCommandWindow:
+    """
+    Keeps up to window_size sequence-numbered commands in flight to the STM.
+    Each ack names the sequence number it confirms. The STM acks a move only once it has finished it,
+    so only the oldest command in flight is timed, from when it became the oldest. It is retransmitted
+    after retransmit_timeout without an ack (the STM drops duplicate sequence numbers).
+    """
+
+    def __init__(self, write: Callable[[int, str], None], window_size: int = 4,
+                 retransmit_timeout: float = 5.0, max_retransmits: int = 3):
+        assert 0 < window_size < SEQ_MODULO // 2, "window must be smaller than half the sequence space"
+        self.write = write
+        self.window_size = window_size
+        self.retransmit_timeout = retransmit_timeout
+        self.max_retransmits = max_retransmits
+        self.condition = Condition()
+        self.next_seq = 0
+        # seq -> [command, first_sent, timer_start, retransmits, tag], timer_start matters for the oldest only
+        self.in_flight: OrderedDict[int, list] = OrderedDict()
+        self.retransmissions = 0
+        self.on_ack: Callable[[int, str, float, int, object], None] = None  # (seq, command, round_trip_s, retransmits, tag)
+
+    def submit(self, command: str, tag=None) -> int:
+        """Sends a command once the window has room, returns its sequence number. tag is handed back to on_ack."""
+        with self.condition:
+            while len(self.in_flight) >= self.window_size:
+                self._wait_step(None)
+            seq = self.next_seq
+            self.next_seq = (seq + 1) % SEQ_MODULO
+            now = time.perf_counter()
+            self.in_flight[seq] = [command, now, now, 0, tag]
+            self.write(seq, command)
+            return seq
+
+    def ack(self, seq: int) -> bool:
+        """Marks a command as confirmed, returns False for unknown or duplicate acks."""
+        with self.condition:
+            was_head = bool(self.in_flight) and next(iter(self.in_flight)) == seq
+            entry = self.in_flight.pop(seq, None)
+            if entry is None:
+                return False
+            if was_head and self.in_flight:
+                # the STM starts on the next command now, its ack is due a timeout from here
+                next(iter(self.in_flight.values()))[2] = time.perf_counter()
+            command, first_sent, _, retransmits, tag = entry
+            if self.on_ack:
+                self.on_ack(seq, command, time.perf_counter() - first_sent, retransmits, tag)
+            self.condition.notify_all()
+            return True
+
+    def wait_for(self, seq: int, timeout: float = None) -> bool:
+        """Blocks until seq is acked, retransmitting as needed. Returns False on timeout."""
+        return self._wait_until(lambda: seq not in self.in_flight, timeout)
+
+    def drain(self, timeout: float = None) -> bool:
+        """Blocks until every command in flight is acked. Returns False on timeout."""
+        return self._wait_until(lambda: not self.in_flight, timeout)
+
+    def pending(self) -> int:
+        with self.condition:
+            return len(self.in_flight)
+
+    def reset(self):
+        """Forgets everything in flight, e.g. after the serial link was reopened."""
+        with self.condition:
+            self.in_flight.clear()
+            self.condition.notify_all()
+
+    def _wait_until(self, done: Callable[[], bool], timeout: float) -> bool:
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        with self.condition:
+            while not done():
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return False
+                self._wait_step(deadline)
+            return True
+
+    def _wait_step(self, deadline: float):
+        """Sleeps until the next ack, retransmit deadline or caller deadline, then retransmits what expired."""
+        now = time.perf_counter()
+        head = next(iter(self.in_flight.values()), None)
+        wake = (head[2] if head is not None else now) + self.retransmit_timeout
+        if deadline is not None:
+            wake = min(wake, deadline)
+        self.condition.wait(max(wake - now, 0))
+        self._retransmit_expired()
+
+    def _retransmit_expired(self):
+        if not self.in_flight:
+            return
+        # commands queued behind the oldest are still waiting in the STM's buffer, not overdue
+        seq, entry = next(iter(self.in_flight.items()))
+        now = time.perf_counter()
+        if now - entry[2] < self.retransmit_timeout:
+            return
+        if entry[3] >= self.max_retransmits:
+            raise TimeoutError(f"STM did not ack {entry[0]} (seq {seq}) after {entry[3]} retransmits")
+        GVL().logger.warning(f"Retransmitting {entry[0]} (seq {seq})")
+        entry[2] = now
+        entry[3] += 1
+        self.retransmissions += 1
+        self.write(seq, entry[0])
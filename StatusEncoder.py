@@ -0,0 +1,33 @@
+import json
+
+_POSITION = b'{"from":"rpi","msg":{"type":"status","data":{"nextAction":"%b","currentPosition":{"orientation":%b,"x":%b,"y":%b}'
+_TARGET = b',"target":{"obstacleId":%b,"imageId":%b}'
+_END = b'}}}\n'
+
+
+class StatusEncoder:
+    """Fills cached byte templates for Android status messages instead of building dicts for json.dumps."""
+
+    def __init__(self):
+        self.orientations: dict[str, bytes] = {}
+
+    def _orientation(self, orientation: str) -> bytes:
+        encoded = self.orientations.get(orientation)
+        if encoded is None:
+            encoded = self.orientations[orientation] = json.dumps(orientation).encode()
+        return encoded
+
+    @staticmethod
+    def _value(value) -> bytes:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return repr(value).encode()  # same text json.dumps produces for numbers
+        return json.dumps(value).encode()
+
+    def encode(self, next_action: str, position_x, position_y, orientation: str, obstacle_id=None, image_id=None) -> bytes:
+        """Newline-terminated status message, with a target block when obstacle_id is given."""
+        message = _POSITION % (next_action.encode(), self._orientation(orientation),
+                               self._value(position_x), self._value(position_y))
+        if obstacle_id is not None:
+            message += _TARGET % (self._value(obstacle_id), self._value(image_id))
+        return message + _END
+
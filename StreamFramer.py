@@ -0,0 +1,103 @@
+import re
+
+from GlobalVariableManager import GVL
+
+# bytes that can change the nesting state; everything else is skipped without a Python-level loop
+_STRUCTURAL = re.compile(rb'[{}\[\]"\\]')
+_OPEN = b"{["[0], b"{["[1]
+_CLOSE = b"}]"[0], b"}]"[1]
+_QUOTE = b'"'[0]
+_BACKSLASH = b"\\"[0]
+
+
+class JSONStreamFramer:
+    """
+    Splits a byte stream into complete JSON messages, scanning every byte once.
+    mode="ndjson": one message per newline-terminated line.
+    mode="concat": objects/arrays back to back (raw_decode style), with or without newlines in between.
+    Works on bytes, so multibyte UTF-8 characters split across reads are only decoded once complete.
+    """
+
+    def __init__(self, mode: str = "concat", max_message_size: int = 1 << 20):
+        assert mode in ("ndjson", "concat"), f"unknown framing mode {mode}"
+        self.mode = mode
+        self.max_message_size = max_message_size
+        self.buffer = bytearray()
+        self._reset_scan()
+
+    def _reset_scan(self):
+        self.scan_pos = 0  # first byte not scanned yet
+        self.start = -1  # start of the value being assembled
+        self.depth = 0
+        self.in_string = False
+        self.escape_at = -1  # index of the byte escaped by a backslash
+
+    def feed(self, data: bytes) -> list[str]:
+        """Adds a chunk and returns every message it completed, in order."""
+        self.buffer += data
+        messages = self._split_lines() if self.mode == "ndjson" else self._split_values()
+        if len(self.buffer) > self.max_message_size:
+            GVL().logger.warning(f"Dropping {len(self.buffer)} bytes of unterminated message")
+            self.buffer.clear()
+            self._reset_scan()
+        return messages
+
+    def _split_lines(self) -> list[str]:
+        buf = self.buffer
+        messages = []
+        start = 0
+        end = buf.find(b"\n", self.scan_pos)
+        while end >= 0:
+            line = bytes(buf[start:end]).strip()
+            if line:
+                messages.append(line.decode("utf-8", errors="replace"))
+            start = end + 1
+            end = buf.find(b"\n", start)
+        del buf[:start]
+        self.scan_pos = len(buf)
+        return messages
+
+    def _split_values(self) -> list[str]:
+        buf = self.buffer
+        messages = []
+        depth = self.depth
+        in_string = self.in_string
+        escape_at = self.escape_at
+        start = self.start
+        consumed = 0
+
+        for match in _STRUCTURAL.finditer(buf, self.scan_pos):
+            i = match.start()
+            c = buf[i]
+            if in_string:
+                if i == escape_at:
+                    continue
+                if c == _BACKSLASH:
+                    escape_at = i + 1
+                elif c == _QUOTE:
+                    in_string = False
+            elif depth == 0:
+                # only objects and arrays are framed, anything between them is skipped
+                if c in _OPEN:
+                    start = i
+                    depth = 1
+            elif c == _QUOTE:
+                in_string = True
+            elif c in _OPEN:
+                depth += 1
+            elif c in _CLOSE:
+                depth -= 1
+                if depth == 0:
+                    messages.append(buf[start:i + 1].decode("utf-8", errors="replace"))
+                    consumed = i + 1
+                    start = -1
+
+        if depth == 0:
+            consumed = len(buf)  # nothing half-read, drop the separators too
+        del buf[:consumed]
+        self.scan_pos = len(buf)
+        self.depth = depth
+        self.in_string = in_string
+        self.escape_at = escape_at - consumed
+        self.start = start - consumed if start >= 0 else -1
+        return messages
@@ -1,24 +1,35 @@
 import socket
-import json
+from collections import deque
 from threading import Thread
 from typing import Callable
 from Broker import Broker
+from Codec import codec
 from GlobalVariableManager import GVL
+from Messages import Message, AlgoPath, PredictionResult
+from StreamFramer import JSONStreamFramer
+from TCPConnectionPool import TCPConnectionPool
+from config import TCP_FRAMING, TCP_RECV_SIZE, TCP_CONNECT_TIMEOUT
 
 class TCPClient(Broker):
     def __init__(self, server_host='127.0.0.1', server_port=12345):
         self.server_host = server_host
         self.server_port = server_port
         self.client_socket: socket.socket = None
-        self.buffer = ""
+        self.framer = JSONStreamFramer(mode=TCP_FRAMING)
+        self.pending: deque[str] = deque()  # complete messages not handed out yet
+        # keep-alive connections for synchronous request/response calls
+        self.pool = TCPConnectionPool(server_host, server_port)
+        # consume() dispatches on the message class
+        self.handlers = {AlgoPath: self.on_path, PredictionResult: self.on_prediction}
 
-    def connect(self):
-        self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    def connect(self, timeout: float = TCP_CONNECT_TIMEOUT):
+        """One connection attempt, bounded by timeout. Returns False if the server could not be reached."""
         try:
-            self.client_socket.connect((self.server_host, self.server_port))
-            return True
-        except:
+            self.client_socket = socket.create_connection((self.server_host, self.server_port), timeout=timeout)
+        except OSError:
             return False
+        self.client_socket.settimeout(None)  # the reader thread blocks until the server sends
+        return True
         
     def send(self, message):
         assert self.client_socket is not None, "client not connected"
@@ -26,67 +37,83 @@ class TCPClient(Broker):
         return
     
     def receive(self):
-        """Receive messages and use a builder pattern to accumulate fragmented data."""
+        """Returns the next complete message, reading from the socket only when none is buffered."""
+        if not self.pending:
+            self.pending.extend(self.receive_all())
+        return self.pending.popleft() if self.pending else None
+
+    def receive_all(self) -> list[str]:
+        """Reads until at least one message is complete and returns all of them, [] once the server closed."""
         assert self.client_socket is not None, "Client not connected, cannot receive"
 
         while True:
-            chunk = self.client_socket.recv(1024).decode('utf-8')
+            chunk = self.client_socket.recv(TCP_RECV_SIZE)
             if not chunk:
-                break  # No more data, message might be complete
-            self.buffer += chunk  # Append to buffer
-            
-            # Try parsing as JSON (optional, if messages are JSON-based)
-            try:
-                message = json.loads(self.buffer)
-                cpy = self.buffer
-                self.buffer = ""  # Reset buffer after successful parse
-                return cpy  # Return complete message
-            except json.JSONDecodeError:
-                continue  # Incomplete message, continue receiving
-
-        return None  # No valid message received
+                return []  # No more data
+            messages = self.framer.feed(chunk)
+            if messages:
+                return messages
 
 
     def run_until_death(self, callback: Callable[[str], None]):
         while True:
-            message = self.receive()
-            if message:
+            messages = self.receive_all()
+            if self.pending:
+                messages = [*self.pending, *messages]
+                self.pending.clear()
+            for message in messages:
                 if callback:
                     callback(message)
 
-    def consume(self, message: dict):
+    def consume(self, message: Message):
         # print("LE MESSAGE", message)
-        if "type" in message:
-            if "path" == message["type"]:
-                GVL().stm_instruction_list = message["data"]
-                GVL().obstacleIdSequence = message["sequence"]
-                GVL().coordinates = message["coordinates"]
+        handler = self.handlers.get(type(message))
+        if handler:
+            handler(message)
+
+    def on_path(self, message: AlgoPath):
+        # one commit, so task1 never wakes to a path without its coordinates
+        with GVL.transaction() as tx:
+            tx.stm_instruction_list = message.data
+            tx.obstacleIdSequence = message.sequence
+            tx.coordinates = message.coordinates
 
-                GVL().logger.debug(GVL().stm_instruction_list)
-                GVL().logger.debug(GVL().obstacleIdSequence)
-                GVL().logger.debug(GVL().coordinates)
-            if "prediction-result" == message["type"]:
-                GVL().predicted_image = message["data"]
+        GVL().logger.debug(GVL().stm_instruction_list)
+        GVL().logger.debug(GVL().obstacleIdSequence)
+        GVL().logger.debug(GVL().coordinates)
 
+        cache = getattr(GVL(), "path_cache", None)
+        if cache is not None:
+            path = {"data": message.data, "sequence": message.sequence, "coordinates": message.coordinates}
+            if cache.complete(path, message.request_id) is None:
+                GVL().logger.info("Path response could not be matched to its map, not cached")
 
-    def send_message(self, message):
-        """Connect to the server, send a message, and receive a response."""
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as client_socket:
-            try:
-                client_socket.connect((self.server_host, self.server_port))
-                # print(f"Connected to server at {self.server_host}:{self.server_port}")
+    def on_prediction(self, message: PredictionResult):
+        GVL().predicted_image = message.data
 
-                client_socket.sendall(message.encode('utf-8'))
-                response = client_socket.recv(1024).decode('utf-8')
-                print(f"Server response: {response}")
 
-            except Exception as e:
-                print(f"Connection error: {e}")
-                response = "error"
-            finally:
-                client_socket.close()
+    def send_message(self, message, timeout: float = None):
+        """Send a message over a pooled connection and return the response, "error" on failure."""
+        try:
+            response = self.pool.request(message, timeout)
+            GVL().logger.debug(f"Server response: {response}")
+        except (OSError, TimeoutError) as e:
+            GVL().logger.error(f"Connection error: {e}")
+            response = "error"
         return response
 
+    def predict(self, timeout: float = None) -> PredictionResult:
+        """
+        Synchronous image prediction over a pooled connection, the result also lands in GVL as if it came
+        in on the main link. Raises OSError/TimeoutError when the server does not answer, ValueError
+        when the answer is not a prediction-result.
+        """
+        _, message = codec.decode_message(self.pool.request("predict", timeout))
+        if not isinstance(message, PredictionResult):
+            raise ValueError(f"Expected a prediction-result, got {message!r}")
+        self.consume(message)
+        return message
+
 if __name__ == "__main__":
     client = TCPClient(server_host='192.168.24.20', server_port=5000)
     client.connect()
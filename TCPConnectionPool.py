@@ -0,0 +1,136 @@
+import select
+import socket
+import time
+from collections import deque
+from threading import BoundedSemaphore, Lock
+
+from GlobalVariableManager import GVL
+from StreamFramer import JSONStreamFramer
+from config import TCP_FRAMING, TCP_RECV_SIZE, TCP_POOL_SIZE, TCP_REQUEST_TIMEOUT, TCP_IDLE_TIMEOUT
+
+
+class PooledConnection:
+    __slots__ = ("sock", "framer", "last_used", "reused")
+
+    def __init__(self, sock: socket.socket, framer: JSONStreamFramer):
+        self.sock = sock
+        self.framer = framer
+        self.last_used = time.monotonic()
+        self.reused = False
+
+
+class TCPConnectionPool:
+    """
+    Bounded pool of keep-alive connections for synchronous request/response calls.
+    Idle connections are health-checked before reuse, so a call normally pays no connection setup.
+    framing="raw" returns the first chunk the server sends instead of a complete JSON message.
+    """
+
+    def __init__(self, host: str, port: int, max_size: int = TCP_POOL_SIZE, timeout: float = TCP_REQUEST_TIMEOUT,
+                 idle_timeout: float = TCP_IDLE_TIMEOUT, framing: str = TCP_FRAMING):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.framing = framing
+        self.slots = BoundedSemaphore(max_size)
+        self.lock = Lock()
+        self.idle: deque[PooledConnection] = deque()
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+
+    def request(self, message: str, timeout: float = None) -> str:
+        """
+        Sends one message and returns the server's response, retrying once if a reused connection went stale.
+        A timeout is not retried: the server may still be working on the request.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        if not self.slots.acquire(timeout=timeout):
+            raise TimeoutError(f"No free connection to {self.host}:{self.port} within {timeout}s")
+        try:
+            conn = self._checkout(timeout)
+            try:
+                return self._exchange(conn, message, timeout)
+            except ConnectionError:
+                if not conn.reused:
+                    raise
+                # the server dropped the idle connection after our health check, try a fresh one
+                GVL().logger.debug(f"Stale pooled connection to {self.host}:{self.port}, reconnecting")
+                return self._exchange(self._connect(timeout), message, timeout)
+        finally:
+            self.slots.release()
+
+    def _exchange(self, conn: PooledConnection, message: str, timeout: float) -> str:
+        reusable = False
+        try:
+            conn.sock.settimeout(timeout)
+            conn.sock.sendall(message.encode('utf-8'))
+            while True:
+                chunk = conn.sock.recv(TCP_RECV_SIZE)
+                if not chunk:
+                    raise ConnectionError(f"{self.host}:{self.port} closed the connection")
+                if conn.framer is None:
+                    reusable = True
+                    return chunk.decode('utf-8', errors='replace')
+                messages = conn.framer.feed(chunk)
+                if messages:
+                    # anything beyond one response means we are out of step with the server
+                    reusable = len(messages) == 1 and not conn.framer.buffer
+                    return messages[0]
+        finally:
+            self._checkin(conn, reusable)
+
+    def _checkout(self, timeout: float) -> PooledConnection:
+        with self.lock:
+            while self.idle:
+                conn = self.idle.pop()  # most recently used first, it is the most likely to be alive
+                if self._healthy(conn):
+                    conn.reused = True
+                    self.reused += 1
+                    return conn
+                self._close(conn)
+        return self._connect(timeout)
+
+    def _connect(self, timeout: float) -> PooledConnection:
+        sock = socket.create_connection((self.host, self.port), timeout=timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.created += 1
+        framer = None if self.framing == "raw" else JSONStreamFramer(mode=self.framing)
+        return PooledConnection(sock, framer)
+
+    def _checkin(self, conn: PooledConnection, reusable: bool):
+        if not reusable:
+            self._close(conn)
+            return
+        conn.last_used = time.monotonic()
+        conn.reused = False
+        with self.lock:
+            self.idle.append(conn)
+
+    def _healthy(self, conn: PooledConnection) -> bool:
+        """An idle connection is usable if it is recent and has nothing to read (no EOF, no stray data)."""
+        if time.monotonic() - conn.last_used > self.idle_timeout:
+            return False
+        try:
+            readable, _, _ = select.select([conn.sock], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return not readable
+
+    def _close(self, conn: PooledConnection):
+        self.discarded += 1
+        try:
+            conn.sock.close()
+        except OSError:
+            pass
+
+    def close(self):
+        """Closes every idle connection."""
+        with self.lock:
+            while self.idle:
+                self._close(self.idle.pop())
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"idle": len(self.idle), "created": self.created, "reused": self.reused, "discarded": self.discarded}
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Compares the JSON backends of Codec.py on recorded traffic.
+
+    python bench_codec.py [traffic_file] [rounds]
+
+traffic_file holds one raw message per line, as written by the dispatcher when TRAFFIC_RECORD_FILE is set
+in config.py. Without one, a built-in sample of a typical run (map upload, path, acks, predictions) is used.
+"""
+import sys
+import time
+
+from Codec import available_codecs, get_codec
+
+
+def sample_traffic() -> list[str]:
+    obstacles = ",".join(
+        f'{{"id":{i},"x":{2 + 3 * i},"y":{15 - i},"d":{i % 4 * 2}}}' for i in range(1, 8)
+    )
+    algo_data = ('{"from":"android","msg":{"type":"algo-data","data":{"value":{"obstacles":[%s],'
+                 '"robot_x":1,"robot_y":1,"robot_dir":0,"retrying":false}}}}' % obstacles)
+    moves = []
+    for i in range(60):
+        moves.append(['{"s":%d}' % (10 + i), '{"l":40.84}', '{"b":%d}' % (5 + i % 7), '{"r":39.27}', '{"p":%d}' % i][i % 5])
+    coordinates = ",".join(f"[{i % 20},{i // 20},{i % 4 * 90}]" for i in range(48))
+    path = ('{"from":"algo","msg":{"type":"path","data":[%s],"sequence":[3,1,7,2,5,4,6],"coordinates":[%s]}}'
+            % (",".join(moves), coordinates))
+    command = '{"from":"android","msg":{"type":"command","data":{"taskId":1,"instruction":"start"}}}'
+    ack = '{"from":"stm","msg":{"type":"ack","seq":%d}}'
+    prediction = '{"from":"image","msg":{"type":"prediction-result","data":{"image_id":"%d","confidence":0.93}}}'
+    heartbeat = '{"from":"android","msg":{"type":"heartbeat"}}'
+
+    traffic = [algo_data, path, command]
+    for i in range(60):
+        traffic.append(ack % i)
+        if i % 5 == 4:
+            traffic.append(prediction % (11 + i // 5))
+        if i % 10 == 0:
+            traffic.append(heartbeat)
+    return traffic
+
+
+def bench(fn, items, rounds: int) -> float:
+    """Microseconds per item, best of rounds."""
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for item in items:
+            fn(item)
+        best = min(best, time.perf_counter() - started)
+    return best / len(items) * 1e6
+
+
+def main():
+    traffic = sample_traffic()
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], encoding="utf-8") as f:
+            traffic = [line.strip() for line in f if line.strip()]
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    encoded = [line.encode() for line in traffic]
+    objects = [get_codec("json").decode(line) for line in traffic]
+    print(f"{len(traffic)} messages, {sum(map(len, encoded))} bytes, best of {rounds} rounds (us/msg)")
+    print(f"{'backend':<10}{'decode':>10}{'bytes':>10}{'typed':>10}{'encode':>10}")
+    for name in available_codecs():
+        codec = get_codec(name)
+        print(f"{name:<10}"
+              f"{bench(codec.decode, traffic, rounds):>10.2f}"
+              f"{bench(codec.decode, encoded, rounds):>10.2f}"
+              f"{bench(codec.decode_message, traffic, rounds):>10.2f}"
+              f"{bench(codec.encode_bytes, objects, rounds):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -22,4 +22,67 @@ UDP_IP = "192.168.24.20"
 UDP_PORT = 9999
 # Syed:
 WS_IP = "192.168.24.49" 
-WS_PORT = 8765
\ No newline at end of file
+WS_PORT = 8765
+WS_FRAME_INTERVAL = 0.05  # seconds, GVL changes within one frame go out to the dashboard together
+
+# Dispatcher: max queued messages per source lane
+DISPATCH_LANE_SIZE = 100
+
+# Mission executor
+STM_ACK_TIMEOUT = 10  # seconds before warning about a missing STM ack (keeps waiting)
+SCAN_SETTLE_TIME = 2  # seconds to hold position after reporting a scanned obstacle
+PREDICT_TIMEOUT = 10.0  # seconds to wait for the image server's prediction at a scan point
+
+# STM windowed streaming: 1 keeps stop-and-wait, N > 1 allows N sequence-numbered commands in flight
+STM_WINDOW_SIZE = 1
+STM_RETRANSMIT_TIMEOUT = 5.0  # seconds without an ack before a command is resent
+STM_MAX_RETRANSMITS = 3
+# STM link framing: "ascii" (5-char commands, JSON ack lines) or "binary" (6-byte frames, see STMFrame.py)
+STM_PROTOCOL = "ascii"
+
+# TCP links (algo / image): "concat" frames back-to-back JSON values, "ndjson" one message per line
+TCP_FRAMING = "concat"
+TCP_RECV_SIZE = 4096
+TCP_CONNECT_TIMEOUT = 3.0  # seconds per connect attempt, an unreachable host is retried by BrokerConnector
+# pooled request/response connections
+TCP_POOL_SIZE = 2
+TCP_REQUEST_TIMEOUT = 5.0  # seconds per call
+TCP_IDLE_TIMEOUT = 30.0  # idle connections older than this are reconnected
+# run the algo/image links on asyncio with request-id correlated request()/predict()
+ASYNC_TCP_LINKS = False
+
+# Android outbound writer
+ANDROID_WRITE_QUEUE_SIZE = 64  # queued messages before send() waits
+ANDROID_WRITE_BATCH_BYTES = 4096  # max bytes joined into one socket write
+ANDROID_PUT_TIMEOUT = 1.0  # seconds send() waits for room before dropping the message
+ANDROID_FLUSH_TIMEOUT = 2.0  # seconds to drain the queue when closing
+# Android inbound framing: "ndjson" splits on newlines, "concat" also copes with unterminated JSON
+ANDROID_FRAMING = "ndjson"
+ANDROID_RECV_SIZE = 4096
+
+# Algo path cache: paths are reused when Android sends a map that was already planned
+PATH_CACHE_SIZE = 32  # maps kept, least recently used dropped first
+PATH_CACHE_FILE = None  # e.g. "path_cache.json" to keep paths across restarts
+PATH_CACHE_PENDING_TIMEOUT = 30.0  # seconds before an unanswered map request is sent again
+
+# merge consecutive straights and cancel zero-sum forward/back pairs before the path is sent to the STM
+# off until it has been checked on the robot, see test_command_parser.py for the coordinate convention
+OPTIMIZE_STM_PATH = False
+
+# GVL changes kept in memory for debugging (GVL.journal())
+GVL_JOURNAL_SIZE = 1024
+
+# JSON backend: "auto" (msgspec, then orjson, then stdlib), "msgspec", "orjson" or "json", see Codec.py
+JSON_CODEC = "auto"
+# append every raw incoming message to this file (one per line) for bench_codec.py, None to disable
+TRAFFIC_RECORD_FILE = None
+
+# optional subsystems, a disabled one never imports its hardware or GUI module (bluetooth, picamera, tkinter)
+ENABLE_BLUETOOTH = True  # Android link
+ENABLE_CAMERA_STREAM = True  # picamera UDP stream process
+ENABLE_TK_MONITOR = False  # Tk GVL window, needs a display
+TK_DISPLAY = ":1"  # used by the Tk monitor when DISPLAY is not set
+
+# startup: every broker connects on its own thread and starts receiving as soon as its link is up
+BROKER_CONNECT_TIMEOUTS = {"android": 60.0, "stm": 5.0, "algo": 10.0, "image": 10.0}  # seconds before a link is reported not ready
+BROKER_CONNECT_RETRY_INTERVAL = 1.0  # seconds between failed connect() attempts
@@ -1,86 +1,184 @@
 import websockets
 import asyncio
-import json
+from Codec import codec
 from GlobalVariableManager import GVL
 import logging
+import time
 import config
-from queue import Queue
 from threading import Lock
 
+
+class MonitorClient:
+    """
+    One connected monitor. Changed keys are merged into pending while a send is in flight, so a slow
+    client gets the latest value of each key once instead of a growing backlog of messages.
+    """
+    __slots__ = ("websocket", "version", "pending", "needs_snapshot", "wakeup", "task")
+
+    def __init__(self, websocket, version: int):
+        self.websocket = websocket
+        self.version = version  # GVL version of the last state sent
+        self.pending: set = set()  # keys changed since then
+        self.needs_snapshot = False
+        self.wakeup = asyncio.Event()
+        self.task: asyncio.Task = None
+
+
 class WebSocketGVLMonitor:
-    def __init__(self, host=config.SELF_STATIC_IP, port=config.WS_PORT):
+    """
+    Serves GVL to browser monitors (gvl_monitor.html). A client gets the whole state once when it
+    connects ("state_update"), then only the keys that changed ("state_delta"), both tagged with the
+    GVL version they reflect. GVL changes wake the event loop directly; a burst of changes is merged
+    into one refresh per frame_interval, and nothing runs while GVL is idle.
+    """
+
+    def __init__(self, host=config.SELF_STATIC_IP, port=config.WS_PORT, frame_interval=config.WS_FRAME_INTERVAL):
         self.host = host
         self.port = port
-        self.connected_clients = set()
+        self.frame_interval = frame_interval
+        self.connected_clients: dict = {}  # websocket -> MonitorClient
         self.logger = logging.getLogger(__name__)
-        self.update_queue = Queue()
+        self.loop: asyncio.AbstractEventLoop = None
+        self.flush_scheduled = False  # a refresh is already on its way to the loop
+        self.flush_lock = Lock()  # only guards flush_scheduled, GVL writers never wait on the monitor's state
+        self.last_flush = 0.0
         self.lock = Lock()
-        
+        # JSON-ready values, only keys changed since state_version are converted again
+        self.state: dict = {}
+        self.state_version = -1
+
+    @staticmethod
+    def _serializable(value):
+        return value if isinstance(value, (list, dict)) else str(value)
+
+    def _refresh(self):
+        """Brings the JSON-ready state up to the current GVL version and queues the changed keys for every client."""
+        with self.lock:
+            snapshot = GVL.snapshot()
+            if snapshot.version == self.state_version:
+                return
+            changed = set()
+            for key in snapshot.changed_since(self.state_version):
+                if key != 'logger' and not key.startswith('_'):
+                    self.state[key] = self._serializable(snapshot.state[key])
+                    changed.add(key)
+            removed = self.state.keys() - snapshot.state.keys()
+            for key in removed:
+                del self.state[key]  # dropped by GVL.initialise
+            self.state_version = snapshot.version
+        for client in self.connected_clients.values():
+            if removed:
+                client.needs_snapshot = True
+            else:
+                client.pending |= changed
+            client.wakeup.set()
+
     def get_gvl_state(self):
         """Get current GVL state as a JSON-serializable dict."""
+        self._refresh()
         with self.lock:
-            state = {}
-            gvl = GVL()
-            for key, value in gvl.__dict__.items():
-                if key != 'logger' and not key.startswith('_'):
-                    if isinstance(value, (list, dict)):
-                        state[key] = value
-                    else:
-                        state[key] = str(value)
-            return state
+            return dict(self.state)
+
+    def _snapshot_message(self) -> dict:
+        return {"type": "state_update", "version": self.state_version, "data": dict(self.state)}
 
     async def notify_state_change(self):
         """Notify all connected clients of state change."""
         if not self.connected_clients:
             return
-            
         try:
-            message = {
-                "type": "state_update",
-                "data": self.get_gvl_state()
-            }
-            websockets.broadcast(self.connected_clients, json.dumps(message))
+            self._refresh()
         except Exception as e:
             self.logger.error(f"Error broadcasting state: {e}")
 
+    async def _send_updates(self, client: MonitorClient):
+        """Sends a client whatever changed since its last message, one message at a time."""
+        try:
+            while True:
+                await client.wakeup.wait()
+                client.wakeup.clear()
+                with self.lock:
+                    # a client that fell behind on most of the state is cheaper to resend whole
+                    if client.needs_snapshot or len(client.pending) * 2 > len(self.state):
+                        message = self._snapshot_message()
+                    elif client.pending:
+                        message = {
+                            "type": "state_delta",
+                            "version": self.state_version,
+                            "since": client.version,
+                            "data": {key: self.state[key] for key in client.pending if key in self.state},
+                        }
+                    else:
+                        continue
+                    client.pending = set()
+                    client.needs_snapshot = False
+                    client.version = self.state_version
+                # encoded outside the lock, the message only holds its own copy of the keys
+                payload = codec.encode(message)
+                # waits while the client's socket buffer is full, later changes merge into pending meanwhile
+                await client.websocket.send(payload)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        except Exception as e:
+            self.logger.error(f"Error sending state update: {e}")
+
     async def register(self, websocket):
         """Register a new client."""
-        self.connected_clients.add(websocket)
         # Send initial state
         try:
-            message = {
-                "type": "state_update",
-                "data": self.get_gvl_state()
-            }
-            await websocket.send(json.dumps(message))
+            self._refresh()
+            with self.lock:
+                client = MonitorClient(websocket, self.state_version)
+                message = self._snapshot_message()
+            payload = codec.encode(message)
+            # registered before the first await, so no change can fall between the snapshot and the deltas
+            self.connected_clients[websocket] = client
+            await websocket.send(payload)
+            client.task = asyncio.create_task(self._send_updates(client))
         except Exception as e:
             self.logger.error(f"Error sending initial state: {e}")
 
     async def unregister(self, websocket):
         """Unregister a client."""
-        self.connected_clients.remove(websocket)
+        client = self.connected_clients.pop(websocket, None)
+        if client is not None and client.task is not None:
+            client.task.cancel()
 
     def setup_gvl_callback(self):
         """Setup callback for GVL changes."""
-        def callback():
-            """Non-async callback that just queues the update."""
-            self.update_queue.put(True)
-            
-        GVL.register_callback(callback)
-
-    async def process_updates(self):
-        """Process queued updates."""
-        while True:
+        def callback(keys, version):
+            """Runs on the writer's thread, only hands the first change of a frame to the loop."""
+            with self.flush_lock:
+                if self.flush_scheduled:
+                    return
+                self.flush_scheduled = True
             try:
-                # Non-blocking check for updates
-                if not self.update_queue.empty():
-                    self.update_queue.get()
-                    await self.notify_state_change()
-                await asyncio.sleep(0.1)  # Small delay to prevent CPU hogging
-            except Exception as e:
-                self.logger.error(f"Error processing updates: {e}")
-
-    async def ws_handler(self, websocket, path):
+                self.loop.call_soon_threadsafe(self._schedule_flush)
+            except RuntimeError:
+                pass  # loop already closed
+
+        GVL.subscribe(None, callback)
+
+    def _schedule_flush(self):
+        # the first change after an idle period goes out at once, the rest of the burst waits for the frame
+        delay = self.last_flush + self.frame_interval - time.monotonic()
+        if delay > 0:
+            self.loop.call_later(delay, self._flush)
+        else:
+            self._flush()
+
+    def _flush(self):
+        with self.flush_lock:
+            self.flush_scheduled = False  # changes from here on need another flush
+        self.last_flush = time.monotonic()
+        if not self.connected_clients:
+            return
+        try:
+            self._refresh()
+        except Exception as e:
+            self.logger.error(f"Error broadcasting state: {e}")
+
+    async def ws_handler(self, websocket, path=None):
         """Handle websocket connections."""
         await self.register(websocket)
         try:
@@ -94,12 +192,11 @@ class WebSocketGVLMonitor:
 
     async def run(self):
         """Run the websocket server."""
+        self.loop = asyncio.get_running_loop()
         self.setup_gvl_callback()
         async with websockets.serve(self.ws_handler, self.host, self.port):
             self.logger.info(f"WebSocket server started at ws://{self.host}:{self.port}")
-            # Start update processor
-            update_task = asyncio.create_task(self.process_updates())
-            await update_task
+            await asyncio.Future()  # serve until cancelled, updates arrive through the GVL callback
 
 def run_websocket_monitor():
     """Run the websocket monitor."""
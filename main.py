@@ -1,24 +1,31 @@
-import os
-from threading import Thread, Semaphore
-import json
 import time
+_import_started = time.perf_counter()
+import os
+import logging
+from threading import Thread, Semaphore, Lock
 import asyncio
 from AndroidBroker import AndroidBroker
 from ImageBroker import ImageBroker, ImageBrokerRunner
 from STMBroker import STMBroker
 from SerialBluetooth import SerialBluetooth
 from TCPClient import TCPClient
+from AsyncTCPClient import AsyncTCPClient
 from Broker import Broker
+from Codec import codec
+from BrokerConnector import BrokerConnector
+from Dispatcher import LaneDispatcher
+from MissionExecutor import MissionExecutor
+from PathCache import PathCache
 from config import *
-import queue
 from multiprocessing import Process
 from CommandParser import CommandParser
-from GlobalVariableManager import GVL, GVLMonitorRunner
+from GlobalVariableManager import GVL
 from gvl_websocket import WebSocketGVLMonitor
 from Logger import createLogger
+from LazyImport import lazy_import, import_report
 
-if "DISPLAY" not in os.environ or os.environ["DISPLAY"] == "":
-    os.environ["DISPLAY"] = ":1"  # Change if needed
+# bluetooth, picamera and tkinter are not imported yet, each subsystem loads its own when it starts
+IMPORT_TIME = time.perf_counter() - _import_started
 
 class BrokerCenter:
     def __init__(self):
@@ -28,22 +35,37 @@ class BrokerCenter:
         # client brokers
         # self.algo_broker: TCPClient = TCPClient(server_host=ALGO_TCP_IP, server_port=ALGO_TCP_PORT)
         # maxwell debugging his bullshit lol
-        self.algo_broker: TCPClient = TCPClient(server_host=ALGO_TCP_IP, server_port=ALGO_TCP_PORT)
-        self.image_prediction_broker: TCPClient = TCPClient(server_host=IMG_TCP_IP, server_port=IMG_TCP_PORT)
+        # AsyncTCPClient adds request/response correlation on the same links
+        link_class = AsyncTCPClient if ASYNC_TCP_LINKS else TCPClient
+        self.algo_broker: TCPClient = link_class(server_host=ALGO_TCP_IP, server_port=ALGO_TCP_PORT)
+        self.image_prediction_broker: TCPClient = link_class(server_host=IMG_TCP_IP, server_port=IMG_TCP_PORT)
+
+        # paths of maps planned before, kept across runs
+        self.path_cache: PathCache = PathCache(PATH_CACHE_SIZE, PATH_CACHE_FILE, PATH_CACHE_PENDING_TIMEOUT)
 
         # WebSocket monitor
         self.websocket_monitor = WebSocketGVLMonitor(host= SELF_STATIC_IP, port=WS_PORT)
 
         self.running_threads: list[Thread] = []
-        self.queue: queue.Queue[str] = queue.Queue(maxsize=100)
+        self.connector: BrokerConnector = BrokerConnector(retry_interval=BROKER_CONNECT_RETRY_INTERVAL)
         self.write_semaphore: Semaphore = Semaphore(1)
-        self.read_semaphore: Semaphore = Semaphore(1)
+        self.task_lock: Lock = Lock()
         self.broker_mapper: dict = {
             "stm": self.stm_broker,
             "android": self.android_broker,
             "algo": self.algo_broker,
             "image": self.image_prediction_broker,
         }
+        self.mission_executor: MissionExecutor = MissionExecutor(
+            self.stm_broker, self.android_broker, self.image_prediction_broker
+        )
+        # one ordered lane per source, so a slow consume only delays its own source
+        self.dispatcher: LaneDispatcher = LaneDispatcher(
+            self.broker_mapper, after_consume=self.check_tasks, maxsize=DISPATCH_LANE_SIZE,
+            # STM acks are confirmed straight from the reader thread, without a lane hop or a JSON decode
+            fast_paths={("stm", "ack"): lambda envelope: self.stm_broker.on_ack(envelope.seq())},
+            record_file=TRAFFIC_RECORD_FILE,
+        )
 
     def _initialise_GVL(self):
         GVL.initialise({
@@ -61,95 +83,88 @@ class BrokerCenter:
             "logger": createLogger(),
             "algo_broker": self.algo_broker,
             "image_prediction_broker":self.image_prediction_broker,
-            "predicted_image": None
+            "predicted_image": None,
+            "path_cache": self.path_cache,
         })
 
+    def enabled_brokers(self) -> dict[str, Broker]:
+        """Brokers with a link to connect and read, Android only when Bluetooth is enabled."""
+        return {name: broker for name, broker in self.broker_mapper.items() if name != "android" or ENABLE_BLUETOOTH}
+
     def connect_all(self):
-        """Connects all brokers."""
+        """
+        Connects all brokers at once, each on its own thread that starts receiving as soon as its link is
+        up. Returns once every link is connected or past its timeout, after logging the readiness report.
+        """
         GVL().logger.info("Connecting..")
-        for broker in [self.android_broker,self.stm_broker,self.algo_broker,self.image_prediction_broker]:
-            broker.connect()
-        GVL().logger.info("Connected..")
+        for name, broker in self.enabled_brokers().items():
+            # Android hands over every message from one read as a batch
+            args = (self.add_to_queue, self.add_batch_to_queue) if broker is self.android_broker else (self.add_to_queue,)
+            receive = lambda broker=broker, args=args: broker.run_until_death(*args)
+            if broker is self.algo_broker:
+                receive = self._receive_algo
+            timeout = BROKER_CONNECT_TIMEOUTS.get(name, 10.0)
+            self.running_threads.append(self.connector.start(name, broker, timeout, receive))
+        ready = self.connector.wait()
+        GVL().logger.log(logging.INFO if ready else logging.WARNING, f"Broker readiness:\n{self.connector.report()}")
+        GVL().logger.info("Connected.." if ready else "Connected, some links are still connecting")
         # self.stream.connect()
 
+    def _receive_algo(self):
+        # maps sent before this link came up are never answered, their paths must not be filed under them
+        self.path_cache.clear_pending()
+        self.algo_broker.run_until_death(self.add_to_queue)
+
     def add_to_queue(self, message: str):
-        """Thread-safe message queuing."""
-        # print(f"queuing {message}")
-        self.read_semaphore.acquire()
-        # critical section..
-        self.queue.put(message)
-        # critical section end.
-        self.read_semaphore.release()
-
-    def queue_listener(self):
-        """Continuously process messages from the shared queue."""
-        while True:
-            message = self.queue.get()
+        """Thread-safe message routing, called from each broker's reader thread."""
+        self.dispatcher.dispatch(message)
 
-            if message == '''{"from":"android","msg":{"type":"heartbeat"}}''':
-                continue
-            # use read semaphore to prevent race conditions
+    def add_batch_to_queue(self, messages: list[str]):
+        """Routes every message from one read in a single call."""
+        self.dispatcher.dispatch_batch(messages)
 
-            self.read_semaphore.acquire()
-            # critical section..
-            # print(f"Processed Message: {message}")  # Replace with actual processing logic
-            
-            GVL().logger.info(f"Processing Message: {message}")
-            try:
-                res = CommandParser.json_decode(message.strip())
-                if res != "" and res is not None:
-                    # json_dict = json.loads(message)
-                    # broker_name = json_dict["from"]
-                    # print(res)
-                    sender = res['from']
-                    content = res['msg']
-                    # print(sender, content)
-                    broker: Broker = self.broker_mapper[sender]
-                    broker.consume(content)
-
-                    # check when to run tasks
-                    if GVL().start and GVL().taskId == 1 and not GVL().isRunning:
-                        GVL().isRunning = True
-                        Thread(target=self.task1).start()
-
-            except (json.JSONDecodeError, KeyError) as e:
-                GVL().logger.warning(f"Invalid message format: {e}")
-            finally:
-                # ALWAYS RELEASE THE SEMAPHORE AFTER USE
-                # GVL().logger.debug(f"Updated States: {GVL()._shared_borg_state}")
-                self.read_semaphore.release()
-                self.queue.task_done()
+    def check_tasks(self):
+        """Starts the requested task once, whichever lane flipped the start flag."""
+        with self.task_lock:
+            if GVL().start and GVL().taskId == 1 and not GVL().isRunning:
+                GVL().isRunning = True
+                Thread(target=self.task1).start()
 
     def start_threads(self):
         """Starts all brokers and listeners as threads."""
-        # Start queue listener in a separate thread
-        queue_thread = Thread(target=self.queue_listener, daemon=True)
-        self.running_threads.append(queue_thread)
-        queue_thread.start()
+        # Start one dispatch lane per source
+        self.running_threads.extend(self.dispatcher.start())
 
         # # Start WebSocket monitor in a thread
         # def run_websocket_monitor():
         #     asyncio.run(self.websocket_monitor.run())
-        tk = Thread(target=GVLMonitorRunner, daemon=True)
-
-        # Start (Android, STM) brokers as threads
-        # for broker in [self.stm_broker, self.android_broker, self.image_prediction_broker]:
-        for broker in [self.stm_broker, self.android_broker, self.algo_broker, self.image_prediction_broker]:
-        # for broker in [self.android_broker, self.stm_broker]:
-            broker_thread = Thread(target=broker.run_until_death, args=(self.add_to_queue,))
-            self.running_threads.append(broker_thread)
-            broker_thread.start()
-        
-        tk.start()
+
+        # Connect (Android, STM, algo, image) brokers in parallel, each reads on its own thread once connected
+        self.connect_all()
+
+        if ENABLE_TK_MONITOR:
+            self.running_threads.append(self.start_tk_monitor())
 
         # Start image streaming as process
-        stream_process = Process(target=self.stream.run_broker_in_process)
-        stream_process.start()
+        stream_process = None
+        if ENABLE_CAMERA_STREAM:
+            stream_process = Process(target=self.stream.run_broker_in_process)
+            stream_process.start()
 
-        tk.join()
+        GVL().logger.info(f"Startup imports took {IMPORT_TIME * 1000:.1f} ms, deferred imports: {import_report()}")
         for t in self.running_threads:
             t.join()
-        stream_process.join()
+        if stream_process is not None:
+            stream_process.join()
+
+    def start_tk_monitor(self) -> Thread:
+        """Opens the Tk GVL monitor, tkinter is only imported here."""
+        if "DISPLAY" not in os.environ or os.environ["DISPLAY"] == "":
+            os.environ["DISPLAY"] = TK_DISPLAY
+        monitor = lazy_import("GVLMonitor")
+        tk = Thread(target=monitor.GVLMonitorRunner.run_GVL_monitor, daemon=True)
+        tk.start()
+        return tk
 
     def task1(self):
         # event loop
@@ -174,11 +189,6 @@ class BrokerCenter:
         temp_buffer = [] # temp buffer to send the instruciton list, using a deep copy
         coordinates_buffer = []
         obstacle_id_buffer = []
-        coordinates_idx = 0
-        obstacle_idx = 0
-        x=0
-        y=0
-        instruction = "" # variable to store instruction like FW010 or BW010 etc...
         while True:
             
             # 0. Check that map not empty and the map has been sent
@@ -187,10 +197,16 @@ class BrokerCenter:
                 gvl.logger.debug(f"gvl.android_has_sent_map: {gvl.android_has_sent_map}")
                 gvl.logger.debug(f"gvl.android_map_data: {gvl.android_map_data}")
                 gvl.logger.debug(f"gvl.stm_instruction_list: {gvl.stm_instruction_list}")
+                # sleep until the map and its path have both arrived
+                GVL.wait_until(lambda: gvl.android_has_sent_map and gvl.android_map_data and gvl.stm_instruction_list)
                 if gvl.android_has_sent_map and gvl.android_map_data and gvl.stm_instruction_list:
                     # reset this flag
                     gvl.android_has_sent_map = False
-                    gvl.parsed_stm_instruction_list = CommandParser.parse_algo_path_to_stm_queue(gvl.stm_instruction_list)
+                    path = gvl.stm_instruction_list
+                    if OPTIMIZE_STM_PATH:
+                        path, gvl.coordinates, removed = CommandParser.optimize_algo_path(path, gvl.coordinates)
+                        gvl.logger.info(f"Path optimizer removed {removed} STM round trips")
+                    gvl.parsed_stm_instruction_list = CommandParser.parse_algo_path_to_stm_queue(path)
                     proc = 20
                     print("Sending map data to algo server")
                     # self.algo_broker
@@ -201,7 +217,7 @@ class BrokerCenter:
                 # gvl.logger.info("Task 1 in state 10")
                 response = "error"
                 retry = 0
-                response = self.algo_broker.send_message(json.dumps(gvl.android_map))
+                response = self.algo_broker.send_message(codec.encode(gvl.android_map))
                 print(f"Algo response: {response}")
                 while response == "error" and retry < 3:
                     print("Algo server error, retrying...")
@@ -218,72 +234,19 @@ class BrokerCenter:
 
             if proc == 20:
                 # gvl.logger.info("Task 1 in state 20")
-                # wait for start
-                if gvl.start:
+                # wait for start, and clear it in the same step
+                if GVL.consume_flag("start"):
                     # go to 30
                     temp_buffer = gvl.parsed_stm_instruction_list
                     coordinates_buffer = gvl.coordinates
                     obstacle_id_buffer = gvl.obstacleIdSequence
-                    gvl.start = False
                     proc = 30
 
             if proc == 30:
-                # gvl.logger.info("Task 1 in state 30")
-                # retrive instruction
-                instruction = None
-                stop = False
-                if len(temp_buffer) > 0:
-                    instruction = temp_buffer.pop(0)
-                    print(instruction, type(instruction))
-                else:
-                    stop = True
-                if instruction is not None:
-                    coord = coordinates_buffer[coordinates_idx]
-                    x,y = coord
-                    x,y = x/10,y/10
-                    if instruction[0] != 'P':
-                        self.android_broker.send_moving(x,y,'N')
-                        coordinates_idx += 1
-                    else:
-                        self.android_broker.send_scanning(x,y,'N')
-                    proc = 31
-                elif stop == False:
-                    proc = 30 # take again
-                else:
-                    proc = 40
-
-            if proc == 31:
-                # gvl.logger.info("Task 1 in state 31")
-                # process instruction
-                if instruction[0] == "P":
-                    # stop and do prediction
-                    gvl.predicted_image = None
-                    GVL().logger.info(f"Scanning Image")
-                    self.image_prediction_broker.send("predict")
-                    while(not gvl.predicted_image):
-                        time.sleep(0.1)
-                    GVL().logger.info(f"Predicted image: {gvl.predicted_image}")
-                    obstacle_id = obstacle_id_buffer[obstacle_idx]
-                    self.android_broker.send_obstacle_image_found(x,y,'N',obstacle_id,21)
-                    obstacle_idx += 1
-                    time.sleep(2)
-                    # do something with the response.. idk yet
-                else:
-                    # if not prediction, send to stm and wait for ack
-                    gvl.logger.info(f"Sending instruction: {instruction}")
-                    gvl.logger.info(instruction)
-                    self.stm_broker.send(instruction)
-                    # break
-                # go and wait for the ack in 32
-                proc = 32 if not instruction[0] == "P" else 30
-
-            if proc == 32:
-                # gvl.logger.info("Task 1 in state 32")
-                # wait for acknowledgement
-                if gvl.stm_ack == True:
-                    gvl.stm_ack = False
-                    proc = 30
-            
+                # run the whole path: STM writes stay on this thread, Android status sends go out in the background
+                self.mission_executor.execute(temp_buffer, coordinates_buffer, obstacle_id_buffer)
+                proc = 40
+
             if proc == 40:
                 # gvl.logger.info("Task 1 in state 40")
                 # send path_done signal to android
@@ -294,6 +257,10 @@ class BrokerCenter:
                 x,y = last_coord[0]/10, last_coord[1]/10
                 self.android_broker.send_idling(x,y,'N')
                 self.android_broker.send_finished(x,y,'N')
+                # per-lane queue depth and consume latency over the run, next to the mission timings
+                self.dispatcher.report()
+                if ENABLE_BLUETOOTH:
+                    self.android_broker.writer.report()
                 break
 
 
@@ -301,7 +268,7 @@ class BrokerCenter:
         """
         Run the broker center
         """
-        self.connect_all()
+        # GVL first: a broker may deliver messages as soon as its own link is up
         self._initialise_GVL()
         self.start_threads()
         # Start all brokers
@@ -312,10 +279,7 @@ class BrokerCenter:
 
         
 
-        # Tkinter Monitor Thread (uncomment to use Tkinter)
-        monitor_thread = Thread(target=self.gvl_monitor.run_GVL_monitor)
-        monitor_thread.start()
-        self.running_threads.append(monitor_thread)
+        # Tkinter Monitor Thread: set ENABLE_TK_MONITOR, started by start_threads
 
         # # Start image streaming as process
         # stream_process = Process(target=self.stream.run_broker_in_process)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# Run with pytest, or directly: python test_command_parser.py
+import random
+
+import CommandParser as command_parser
+from CommandParser import CommandParser
+
+
+def _random_path(rng: random.Random, length: int) -> list:
+    path = []
+    for _ in range(length):
+        key = rng.choice("sblrpx")
+        value = rng.choice([rng.randint(-300, 300), round(rng.uniform(-300, 300), 2)])
+        path.append({key: value})
+    return path
+
+
+def _check_compile_path_matches(seed: int):
+    rng = random.Random(seed)
+    for _ in range(1000):
+        CommandParser._command_cache.clear()
+        # short paths take the plain math branch, long ones have enough new turns to be vectorized
+        length = rng.choice([rng.randint(0, command_parser._VECTORIZE_MIN - 1), rng.randint(3 * command_parser._VECTORIZE_MIN, 400)])
+        path = _random_path(rng, length)
+        assert CommandParser.compile_path(path) == [CommandParser.map_algo_to_stm_command(p) for p in path], path
+
+
+def test_compile_path_matches_map_algo_to_stm_command():
+    _check_compile_path_matches(seed=17)
+
+
+def test_compile_path_matches_map_algo_to_stm_command_without_numpy():
+    np = command_parser.np
+    command_parser.np = False
+    try:
+        _check_compile_path_matches(seed=18)
+    finally:
+        command_parser.np = np
+        CommandParser._command_cache.clear()
+
+
+def test_optimize_keeps_coordinate_before_each_motion():
+    # coordinates[k] is the position before the k-th motion, the last one is where the robot ends up
+    path = [{"s": 10}, {"s": 20}, {"l": 30}, {"p": 0}, {"b": 10}, {"s": 10}, {"r": 5}]
+    coordinates = ["c0", "c1", "c2", "c3", "c4", "c5", "c6"]
+    new_path, new_coordinates, removed = CommandParser.optimize_algo_path(path, coordinates)
+    assert new_path == [{"s": 30}, {"l": 30}, {"p": 0}, {"r": 5}]
+    # s10+s20 keep c0, the b10/s10 pair drops c3 and c4, r5 keeps c5, the final position stays
+    assert new_coordinates == ["c0", "c2", "c5", "c6"]
+    assert removed == 3
+
+
+def test_optimize_leaves_unmergeable_path_alone():
+    path = [{"s": 10}, {"l": 30}, {"s": 10}, {"p": 0}, {"b": 20}, {"r": 5}]
+    coordinates = ["c0", "c1", "c2", "c3", "c4", "c5"]
+    new_path, new_coordinates, removed = CommandParser.optimize_algo_path(path, coordinates)
+    assert new_path == path
+    assert new_coordinates == coordinates
+    assert removed == 0
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name} ok")
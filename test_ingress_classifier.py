@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# Run with pytest, or directly: python test_ingress_classifier.py
+from IngressClassifier import classify
+from Messages import AlgoData
+
+
+def _seq(raw: str):
+    return classify(raw).seq()
+
+
+def _raises_value_error(raw: str) -> bool:
+    try:
+        _seq(raw)
+    except ValueError:
+        return True
+    return False
+
+
+def test_header_is_read_without_decoding():
+    envelope = classify('{"from": "android", "msg": {"type": "algo-data", "data": {"obstacles": []}}}')
+    assert (envelope.sender, envelope.type) == ("android", "algo-data")
+    assert envelope._msg is None
+    assert isinstance(envelope.msg, AlgoData)
+
+
+def test_reordered_header_falls_back_to_full_decode():
+    envelope = classify('{"msg": {"seq": 4, "type": "ack"}, "from": "stm"}')
+    assert (envelope.sender, envelope.type) == ("stm", "ack")
+    assert envelope.seq() == 4
+
+
+def test_invalid_messages_are_rejected():
+    assert classify('{"msg": {"type": "ack"}}') is None
+    assert classify("not json") is None
+
+
+def test_seq_of_well_formed_acks():
+    assert _seq('{"from":"stm","msg":{"type":"ack"}}') is None
+    assert _seq('{"from": "stm", "msg": {"type": "ack", "seq": 7}}\n') == 7
+    assert _seq('{"from":"stm","msg":{"type":"ack","seq":"8"}}') == 8
+
+
+def test_seq_is_never_read_from_a_nested_field():
+    assert _seq('{"from":"stm","msg":{"type":"ack","x":{"seq":5}}}') is None
+
+
+def test_seq_of_malformed_acks_raises_value_error():
+    assert _raises_value_error('{"from":"stm","msg":{"type":"ack"')
+    assert _raises_value_error('{"from":"stm","msg":{"type":"ack","seq":3}} trailing')
+    assert _raises_value_error('{"from":"stm","msg":{"type":"ack","seq":[1]}}')
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name} ok")
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# Run with pytest, or directly: python test_stm_frame.py
+from STMFrame import OP_ACK, OPCODES, STMFrameDecoder, decode_command, encode_command, encode_frame
+
+
+def test_command_round_trip():
+    frame = encode_command("CF045", 12)
+    assert len(frame) == 6
+    (opcode, magnitude, seq), = STMFrameDecoder().feed(frame)
+    assert (opcode, magnitude, seq) == (OPCODES["CF"], 45, 12)
+    assert decode_command(opcode, magnitude) == "CF045"
+
+
+def test_frames_split_across_reads():
+    data = encode_command("FW010", 1) + encode_frame(OP_ACK, 0, 1) + encode_command("BW020", 2)
+    decoder = STMFrameDecoder()
+    frames = []
+    for i in range(len(data)):
+        frames += decoder.feed(data[i:i + 1])
+    assert frames == [(OPCODES["FW"], 10, 1), (OP_ACK, 0, 1), (OPCODES["BW"], 20, 2)]
+    assert decoder.crc_errors == 0
+
+
+def test_resyncs_after_noise_and_bad_crc():
+    ack = encode_frame(OP_ACK, 0, 3)
+    corrupt = bytearray(encode_command("FW010", 4))
+    corrupt[5] ^= 0xFF
+    decoder = STMFrameDecoder()
+    frames = decoder.feed(b"\x00\x13garbage" + bytes(corrupt) + ack)
+    assert frames == [(OP_ACK, 0, 3)]
+    assert decoder.crc_errors == 1
+
+
+def test_sync_byte_inside_frame_is_not_a_frame_start():
+    # 0xA5 as the magnitude byte, the decoder must not resync into the middle of a valid frame
+    frame = encode_frame(OPCODES["FW"], 0xA5, 0xA5)
+    assert STMFrameDecoder().feed(frame + frame) == [(OPCODES["FW"], 0xA5, 0xA5)] * 2
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name} ok")
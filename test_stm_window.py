@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# Run with pytest, or directly: python test_stm_window.py
+import logging
+import threading
+import time
+
+from GlobalVariableManager import GVL
+from STMWindow import STMCommandWindow, SEQ_MODULO
+
+GVL.initialise({"logger": logging.getLogger(__name__)})
+
+
+def _window(**kwargs) -> tuple[STMCommandWindow, list]:
+    writes = []
+    return STMCommandWindow(lambda seq, command: writes.append((seq, command)), **kwargs), writes
+
+
+def test_ack_of_non_head_keeps_head_timer():
+    window, writes = _window(retransmit_timeout=5.0)
+    for command in ("FW010", "FW020", "FW030"):
+        window.submit(command)
+    head_timer = window.in_flight[0][2]
+    assert window.ack(1)
+    assert not window.ack(1)  # duplicate
+    assert not window.ack(7)  # never sent
+    assert window.in_flight[0][2] == head_timer
+    assert list(window.in_flight) == [0, 2]
+
+
+def test_ack_of_head_restarts_next_timer():
+    window, writes = _window(retransmit_timeout=0.1)
+    window.submit("FW010")
+    window.submit("FW020")
+    time.sleep(0.07)
+    window.ack(0)
+    # seq 1 was queued for 0.07 s, its own timeout only starts now
+    assert window.wait_for(1, 0.05) is False
+    assert writes == [(0, "FW010"), (1, "FW020")]
+    assert window.retransmissions == 0
+
+
+def test_retransmits_head_only():
+    window, writes = _window(retransmit_timeout=0.03)
+    window.submit("FW010")
+    window.submit("FW020")
+    assert window.wait_for(1, 0.08) is False
+    assert writes[:2] == [(0, "FW010"), (1, "FW020")]
+    assert writes[2:] and all(write == (0, "FW010") for write in writes[2:])
+
+
+def test_max_retransmits_raises_timeout_error():
+    window, writes = _window(retransmit_timeout=0.01, max_retransmits=2)
+    window.submit("FW010")
+    try:
+        window.drain(1.0)
+    except TimeoutError:
+        pass
+    else:
+        raise AssertionError("drain() did not give up")
+    assert writes == [(0, "FW010")] * 3
+
+
+def test_full_window_blocks_submit_until_ack():
+    window, writes = _window(window_size=1)
+    window.submit("FW010")
+    threading.Timer(0.05, window.ack, args=(0,)).start()
+    started = time.perf_counter()
+    assert window.submit("FW020") == 1
+    assert time.perf_counter() - started >= 0.04
+
+
+def test_sequence_numbers_wrap_around():
+    window, writes = _window(window_size=4)
+    acked = []
+    window.on_ack = lambda seq, command, round_trip, retransmits, tag: acked.append((seq, tag))
+    for i in range(SEQ_MODULO + 10):
+        seq = window.submit("FW010", tag=i)
+        assert seq == i % SEQ_MODULO
+        if i >= 2:
+            assert window.ack((i - 2) % SEQ_MODULO)
+    assert window.drain(0) is False
+    assert window.ack((SEQ_MODULO + 8) % SEQ_MODULO) and window.ack((SEQ_MODULO + 9) % SEQ_MODULO)
+    assert window.drain(0)
+    assert acked == [(i % SEQ_MODULO, i) for i in range(SEQ_MODULO + 10)]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name} ok")
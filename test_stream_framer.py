@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# Run with pytest, or directly: python test_stream_framer.py
+import logging
+
+from GlobalVariableManager import GVL
+from StreamFramer import JSONStreamFramer
+
+GVL.initialise({"logger": logging.getLogger(__name__)})
+
+
+def _feed_bytewise(framer: JSONStreamFramer, data: bytes) -> list:
+    messages = []
+    for i in range(len(data)):
+        messages += framer.feed(data[i:i + 1])
+    return messages
+
+
+def test_back_to_back_values():
+    data = b'{"a":1}{"b":[1,2]} [3]\n{"c":{"d":"}"}}'
+    assert JSONStreamFramer().feed(data) == ['{"a":1}', '{"b":[1,2]}', '[3]', '{"c":{"d":"}"}}']
+
+
+def test_values_split_across_reads():
+    data = b'{"a":"x\\"}{"}{"b":2}'
+    assert _feed_bytewise(JSONStreamFramer(), data) == ['{"a":"x\\"}{"}', '{"b":2}']
+
+
+def test_split_utf8_character():
+    data = '{"label":"é→😀"}\n'.encode()
+    assert _feed_bytewise(JSONStreamFramer(), data) == ['{"label":"é→😀"}']
+    assert _feed_bytewise(JSONStreamFramer(mode="ndjson"), data) == ['{"label":"é→😀"}']
+
+
+def test_ndjson_lines():
+    framer = JSONStreamFramer(mode="ndjson")
+    assert framer.feed(b'{"a":1}\n\n  {"b":2}\r\n{"c"') == ['{"a":1}', '{"b":2}']
+    assert framer.feed(b':3}\n') == ['{"c":3}']
+
+
+def test_oversized_message_is_dropped():
+    framer = JSONStreamFramer(max_message_size=16)
+    assert framer.feed(b'{"a":"' + b"x" * 32) == []
+    assert framer.feed(b'{"b":1}') == ['{"b":1}']
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name} ok")